@@ -2,6 +2,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session, select
 from models import User
+from user_cache import user_cache
 from token import decode_token
 from main import get_session
 
@@ -16,6 +17,10 @@ def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Dep
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+
     user = session.exec(select(User).where(User.username == username)).first()
     if not user:
         raise HTTPException(
@@ -23,4 +28,4 @@ def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Dep
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return user
+    return user_cache.put(user)
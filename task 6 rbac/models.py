@@ -1,7 +1,10 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from typing import Optional
 
 class User(SQLModel, table=True):
+    __table_args__ = (Index("ix_user_role_id", "role", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     username: str = Field(unique=True, index=True)
     password: str
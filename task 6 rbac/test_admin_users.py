@@ -0,0 +1,32 @@
+import json
+from sqlmodel import Session, SQLModel, create_engine
+from models import User
+from admin_users import admin_users_page, iter_admin_users
+
+def make_engine():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        for i in range(5):
+            session.add(User(username=f"user{i}", password="hash", role="admin" if i % 2 else "user"))
+        session.commit()
+    return engine
+
+def test_pages_by_id_with_role_filter():
+    engine = make_engine()
+    with Session(engine) as session:
+        items, next_after_id = admin_users_page(session, None, None, 2)
+        assert [item["username"] for item in items] == ["user0", "user1"]
+        assert set(items[0]) == {"id", "username", "role"}
+
+        items, next_after_id = admin_users_page(session, None, next_after_id, 10)
+        assert [item["username"] for item in items] == ["user2", "user3", "user4"]
+        assert next_after_id is None
+
+        items, _ = admin_users_page(session, "admin", None, 10)
+        assert [item["username"] for item in items] == ["user1", "user3"]
+
+def test_stream_yields_ndjson_after_cursor():
+    engine = make_engine()
+    lines = "".join(iter_admin_users(engine, "user", 1)).splitlines()
+    assert [json.loads(line)["username"] for line in lines] == ["user2", "user4"]
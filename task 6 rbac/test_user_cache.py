@@ -0,0 +1,68 @@
+import logging
+from sqlmodel import Session, SQLModel, create_engine
+from models import User
+import threading
+import user_cache as user_cache_module
+from user_cache import user_cache, publish_invalidation, _listen_for_invalidations
+
+def test_rename_invalidates_old_and_new_username():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(username="alice", password="hash")
+        session.add(user)
+        session.commit()
+        user_cache.put(user)
+        user_cache.put(User(username="alicia", password="stale"))
+
+        user.username = "alicia"
+        session.add(user)
+        session.commit()
+
+    assert user_cache.get("alice") is None
+    assert user_cache.get("alicia") is None
+
+class BrokenRedis:
+    def publish(self, channel, message):
+        raise ConnectionError("redis went away")
+
+def test_publish_failure_is_logged_not_raised(monkeypatch, caplog):
+    monkeypatch.setattr(user_cache_module, "_redis_client", BrokenRedis())
+    user_cache.put(User(username="bob", password="hash"))
+
+    with caplog.at_level(logging.WARNING, logger="user_cache"):
+        publish_invalidation("bob")
+    assert user_cache.get("bob") is None
+    assert any("bob" in record.message for record in caplog.records)
+
+class FlakyRedis:
+    def __init__(self, stop):
+        self.stop = stop
+        self.connects = 0
+
+    def pubsub(self, ignore_subscribe_messages):
+        self.connects += 1
+        if self.connects == 1:
+            raise ConnectionError("redis went away")
+        return self
+
+    def subscribe(self, channel):
+        pass
+
+    def listen(self):
+        user_cache.put(User(username="carol", password="hash"))
+        user_cache.put(User(username="dave", password="hash"))
+        self.stop.set()
+        yield {"type": "message", "data": b"carol"}
+
+def test_listener_reconnects_and_clears_cache(monkeypatch):
+    monkeypatch.setattr(user_cache_module, "INVALIDATION_RETRY_SECONDS", 0)
+    user_cache.put(User(username="erin", password="hash"))
+    stop = threading.Event()
+    client = FlakyRedis(stop)
+
+    _listen_for_invalidations(client, stop)
+    assert client.connects == 2
+    assert user_cache.get("erin") is None
+    assert user_cache.get("carol") is None
+    assert user_cache.get("dave") is not None
@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import User
+import logging
+import os
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", 30))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", 10000))
+REDIS_URL = os.getenv("REDIS_URL")
+INVALIDATION_CHANNEL = "user-cache:invalidate"
+INVALIDATION_RETRY_SECONDS = float(os.getenv("USER_CACHE_INVALIDATION_RETRY_SECONDS", 1))
+
+logger = logging.getLogger(__name__)
+
+class UserCache:
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username: str):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+            return user
+
+    def put(self, user: User) -> User:
+        snapshot = User(**user.model_dump())
+        with self._lock:
+            self._entries[user.username] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, username: str):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+user_cache = UserCache(USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_SIZE)
+_redis_client = None
+_stop_listening = threading.Event()
+
+def publish_invalidation(username: str):
+    user_cache.invalidate(username)
+    if _redis_client is None:
+        return
+    try:
+        _redis_client.publish(INVALIDATION_CHANNEL, username)
+    except Exception:
+        logger.warning("could not publish user cache invalidation for %s", username, exc_info=True)
+
+def _listen_for_invalidations(client, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # anything published while we were disconnected is lost
+            user_cache.clear()
+            for message in pubsub.listen():
+                if message["type"] == "message":
+                    user_cache.invalidate(message["data"].decode("utf-8"))
+                if stop.is_set():
+                    return
+        except Exception:
+            logger.warning("user cache invalidation listener disconnected, retrying", exc_info=True)
+            stop.wait(INVALIDATION_RETRY_SECONDS)
+
+def start_invalidation_listener():
+    global _redis_client
+    if not REDIS_URL or redis is None or _redis_client is not None:
+        return
+    _redis_client = redis.Redis.from_url(REDIS_URL)
+    threading.Thread(target=_listen_for_invalidations, args=(_redis_client, _stop_listening), daemon=True).start()
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_user_changed(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        changed = session.info.setdefault("changed_usernames", set())
+        changed.add(target.username)
+        changed.update(inspect(target).attrs.username.history.deleted)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for username in session.info.pop("changed_usernames", ()):
+        publish_invalidation(username)
@@ -0,0 +1,26 @@
+from sqlmodel import Session, select
+from models import User
+from typing import Optional
+import json
+
+ADMIN_USERS_STREAM_BATCH = 1000
+
+def admin_users_statement(role: Optional[str], after_id: Optional[int]):
+    stmt = select(User.id, User.username, User.role).order_by(User.id)
+    if role is not None:
+        stmt = stmt.where(User.role == role)
+    if after_id is not None:
+        stmt = stmt.where(User.id > after_id)
+    return stmt
+
+def admin_users_page(session: Session, role: Optional[str], after_id: Optional[int], limit: int):
+    rows = session.exec(admin_users_statement(role, after_id).limit(limit + 1)).all()
+    items = [dict(row._mapping) for row in rows[:limit]]
+    next_after_id = items[-1]["id"] if len(rows) > limit else None
+    return items, next_after_id
+
+def iter_admin_users(engine, role: Optional[str], after_id: Optional[int]):
+    stmt = admin_users_statement(role, after_id).execution_options(stream_results=True, yield_per=ADMIN_USERS_STREAM_BATCH)
+    with Session(engine) as session:
+        for rows in session.exec(stmt).partitions():
+            yield "".join(json.dumps(dict(row._mapping)) + "\n" for row in rows)
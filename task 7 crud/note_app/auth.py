@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
@@ -6,39 +7,80 @@ from datetime import datetime, timedelta
 from sqlmodel import Session, select
 from database import get_session
 from models import User
+from user_cache import user_cache
+import threading
+import time
 
 SECRET_KEY = "your_secret"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+TOKEN_VERSION_TTL_SECONDS = 60
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+_token_versions = {}
+_token_versions_lock = threading.Lock()
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    id: int
+    username: str
+    role: str
+
 def get_password_hash(password: str):
     return pwd_context.hash(password)
 
 def verify_password(plain: str, hashed: str):
     return pwd_context.verify(plain, hashed)
 
+def token_claims(user: User):
+    return {"sub": user.username, "uid": user.id, "role": user.role, "ver": user.token_version}
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+def forget_token_version(user_id: int):
+    with _token_versions_lock:
+        _token_versions.pop(user_id, None)
+
+def _token_version_matches(session: Session, user_id: int, version: int) -> bool:
+    with _token_versions_lock:
+        entry = _token_versions.get(user_id)
+    if entry is not None and entry[1] > time.monotonic() and entry[0] == version:
+        return True
+    current = session.exec(select(User.token_version).where(User.id == user_id)).first()
+    if current is None:
+        return False
+    with _token_versions_lock:
+        _token_versions[user_id] = (current, time.monotonic() + TOKEN_VERSION_TTL_SECONDS)
+    return current == version
+
+def get_current_principal(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> Principal:
     credentials_exception = HTTPException(status_code=401, detail="Invalid token")
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if not username:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
-
-    user = session.exec(select(User).where(User.username == username)).first()
-    if not user:
+    username = payload.get("sub")
+    user_id = payload.get("uid")
+    version = payload.get("ver")
+    if not username or user_id is None or version is None:
         raise credentials_exception
+    if not _token_version_matches(session, user_id, version):
+        raise credentials_exception
+    return Principal(id=user_id, username=username, role=payload.get("role", "user"))
+
+def get_current_user(principal: Principal = Depends(get_current_principal), session: Session = Depends(get_session)):
+    user = user_cache.get(principal.username)
+    if user is None:
+        user = session.get(User, principal.id)
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        user = user_cache.put(user)
     return user
 
 def require_role(role: str):
@@ -1,19 +1,26 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
-from database import init_db, get_session
+from typing import Optional
+from database import engine, init_db, get_session
+from instrumentation import SQLTimingMiddleware
 from models import User, Note
 from schemas import UserCreate, UserLogin, Token, NoteCreate, NoteOut, NoteUpdate
+from user_cache import start_invalidation_listener
+from admin_users import admin_users_page, iter_admin_users
 from auth import (
     get_password_hash, verify_password,
-    create_access_token, get_current_user,
-    require_role
+    create_access_token, token_claims,
+    get_current_principal, Principal, require_role
 )
 
 app = FastAPI()
+app.add_middleware(SQLTimingMiddleware)
 
 @app.on_event("startup")
 def on_startup():
     init_db()
+    start_invalidation_listener()
 
 # 🔐 REGISTER
 @app.post("/register")
@@ -34,23 +41,38 @@ def login(user: UserLogin, session: Session = Depends(get_session)):
     db_user = session.exec(select(User).where(User.username == user.username)).first()
     if not db_user or not verify_password(user.password, db_user.password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = create_access_token(data={"sub": db_user.username})
+    token = create_access_token(data=token_claims(db_user))
     return {"access_token": token, "token_type": "bearer"}
 
 # 👤 USER INFO
 @app.get("/users/me")
-def read_me(current_user: User = Depends(get_current_user)):
+def read_me(current_user: Principal = Depends(get_current_principal)):
     return {"id": current_user.id, "username": current_user.username, "role": current_user.role}
 
 # 👑 ADMIN ROUTE
 @app.get("/admin/users")
-def get_all_users(session: Session = Depends(get_session), current_user: User = Depends(require_role("admin"))):
-    users = session.exec(select(User)).all()
-    return users
+def get_all_users(
+    response: Response,
+    role: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    stream: bool = False,
+    envelope: bool = False,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(require_role("admin"))
+):
+    if stream:
+        return StreamingResponse(iter_admin_users(engine, role, after_id), media_type="application/x-ndjson")
+    items, next_after_id = admin_users_page(session, role, after_id, limit)
+    if envelope:
+        return {"items": items, "next_after_id": next_after_id}
+    if next_after_id is not None:
+        response.headers["X-Next-After-Id"] = str(next_after_id)
+    return items
 
 # 📝 CRUD ЗАМЕТОК
 @app.post("/notes", response_model=NoteOut)
-def create_note(note: NoteCreate, session: Session = Depends(get_session), user: User = Depends(get_current_user)):
+def create_note(note: NoteCreate, session: Session = Depends(get_session), user: Principal = Depends(get_current_principal)):
     new_note = Note(**note.dict(), owner_id=user.id)
     session.add(new_note)
     session.commit()
@@ -58,19 +80,19 @@ def create_note(note: NoteCreate, session: Session = Depends(get_session), user:
     return new_note
 
 @app.get("/notes", response_model=list[NoteOut])
-def list_notes(session: Session = Depends(get_session), user: User = Depends(get_current_user)):
+def list_notes(session: Session = Depends(get_session), user: Principal = Depends(get_current_principal)):
     notes = session.exec(select(Note).where(Note.owner_id == user.id)).all()
     return notes
 
 @app.get("/notes/{note_id}", response_model=NoteOut)
-def get_note(note_id: int, session: Session = Depends(get_session), user: User = Depends(get_current_user)):
+def get_note(note_id: int, session: Session = Depends(get_session), user: Principal = Depends(get_current_principal)):
     note = session.get(Note, note_id)
     if not note or note.owner_id != user.id:
         raise HTTPException(status_code=404, detail="Note not found")
     return note
 
 @app.put("/notes/{note_id}", response_model=NoteOut)
-def update_note(note_id: int, note_data: NoteUpdate, session: Session = Depends(get_session), user: User = Depends(get_current_user)):
+def update_note(note_id: int, note_data: NoteUpdate, session: Session = Depends(get_session), user: Principal = Depends(get_current_principal)):
     note = session.get(Note, note_id)
     if not note or note.owner_id != user.id:
         raise HTTPException(status_code=404, detail="Note not found")
@@ -82,7 +104,7 @@ def update_note(note_id: int, note_data: NoteUpdate, session: Session = Depends(
     return note
 
 @app.delete("/notes/{note_id}")
-def delete_note(note_id: int, session: Session = Depends(get_session), user: User = Depends(get_current_user)):
+def delete_note(note_id: int, session: Session = Depends(get_session), user: Principal = Depends(get_current_principal)):
     note = session.get(Note, note_id)
     if not note or note.owner_id != user.id:
         raise HTTPException(status_code=404, detail="Note not found")
@@ -1,15 +1,21 @@
 from typing import Optional, List
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 
 class User(SQLModel, table=True):
+    __table_args__ = (Index("ix_user_role_id", "role", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     username: str = Field(index=True, unique=True)
     password: str
     role: str = Field(default="user")
+    token_version: int = Field(default=0)
 
     notes: List["Note"] = Relationship(back_populates="owner")
 
 class Note(SQLModel, table=True):
+    __table_args__ = (Index("ix_note_owner_id_id", "owner_id", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     content: str
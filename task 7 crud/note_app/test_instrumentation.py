@@ -0,0 +1,37 @@
+import logging
+import re
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+import instrumentation
+from instrumentation import SQLTimingMiddleware, instrument_engine
+
+def make_client():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    app = FastAPI()
+    app.add_middleware(SQLTimingMiddleware)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as conn:
+            for n in range(3):
+                conn.execute(text(f"SELECT {n}"))
+        return {"id": item_id}
+
+    return TestClient(app)
+
+def test_server_timing_header():
+    res = make_client().get("/items/1")
+    match = re.fullmatch(r'db;dur=([\d.]+);desc="(\d+) queries"', res.headers["server-timing"])
+    assert match
+    assert int(match.group(2)) == 3
+
+def test_slow_query_and_n_plus_one_logged_with_route(monkeypatch, caplog):
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(instrumentation, "N_PLUS_ONE_THRESHOLD", 2)
+    with caplog.at_level(logging.WARNING, logger="sql"):
+        make_client().get("/items/1")
+    messages = [record.message for record in caplog.records]
+    assert any(message.startswith("slow query") and "/items/{item_id}" in message for message in messages)
+    assert "possible N+1 on /items/{item_id}: 3 near-identical statements: SELECT ?" in messages
@@ -0,0 +1,35 @@
+from sqlalchemy import inspect
+from sqlmodel import Session, create_engine
+import database
+from auth import _token_version_matches, forget_token_version
+from models import User
+
+def test_init_db_adds_token_version_to_existing_user_table(monkeypatch):
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE "user" (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, password VARCHAR NOT NULL, role VARCHAR NOT NULL)')
+        conn.exec_driver_sql("""INSERT INTO "user" (username, password, role) VALUES ('alice', 'hash', 'user')""")
+    monkeypatch.setattr(database, "engine", engine)
+
+    database.init_db()
+    database.init_db()
+    assert "token_version" in {column["name"] for column in inspect(engine).get_columns("user")}
+    with Session(engine) as session:
+        assert session.get(User, 1).token_version == 0
+
+def test_bumped_token_version_revokes_old_tokens():
+    engine = create_engine("sqlite://")
+    User.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(username="alice", password="hash")
+        session.add(user)
+        session.commit()
+        assert _token_version_matches(session, user.id, 0)
+
+        user.token_version += 1
+        session.add(user)
+        session.commit()
+        forget_token_version(user.id)
+        assert not _token_version_matches(session, user.id, 0)
+        assert _token_version_matches(session, user.id, 1)
+        assert not _token_version_matches(session, user.id + 1, 0)
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
@@ -5,23 +6,58 @@ from auth import SECRET_KEY, ALGORITHM
 from sqlmodel import Session, select
 from database import get_session
 from models import User
+import threading
+import time
+
+TOKEN_VERSION_TTL_SECONDS = 60
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> User:
+_token_versions = {}
+_token_versions_lock = threading.Lock()
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    id: int
+    username: str
+    role: str
+
+def forget_token_version(user_id: int):
+    with _token_versions_lock:
+        _token_versions.pop(user_id, None)
+
+def _token_version_matches(session: Session, user_id: int, version: int) -> bool:
+    with _token_versions_lock:
+        entry = _token_versions.get(user_id)
+    if entry is not None and entry[1] > time.monotonic() and entry[0] == version:
+        return True
+    current = session.exec(select(User.token_version).where(User.id == user_id)).first()
+    if current is None:
+        return False
+    with _token_versions_lock:
+        _token_versions[user_id] = (current, time.monotonic() + TOKEN_VERSION_TTL_SECONDS)
+    return current == version
+
+def get_current_principal(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if not username:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
+    username = payload.get("sub")
+    user_id = payload.get("uid")
+    version = payload.get("ver")
+    if not username or user_id is None or version is None:
+        raise credentials_exception
+    if not _token_version_matches(session, user_id, version):
+        raise credentials_exception
+    return Principal(id=user_id, username=username, role=payload.get("role", "user"))
 
-    user = session.exec(select(User).where(User.username == username)).first()
+def get_current_user(principal: Principal = Depends(get_current_principal), session: Session = Depends(get_session)) -> User:
+    user = session.get(User, principal.id)
     if not user:
-        raise credentials_exception
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
     return user
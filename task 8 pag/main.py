@@ -1,13 +1,16 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Query
 from sqlmodel import Session, select
-from typing import List, Optional
+from typing import List, Optional, Union
 from database import init_db, get_session
+from instrumentation import SQLTimingMiddleware
 from models import User, Note
-from schemas import UserCreate, UserLogin, Token, NoteCreate, NoteUpdate, NoteOut
-from auth import get_password_hash, verify_password, create_access_token
-from deps import get_current_user
+from schemas import UserCreate, UserLogin, Token, NoteCreate, NoteUpdate, NoteOut, NotePage
+from auth import get_password_hash, verify_password, create_access_token, token_claims
+from deps import Principal, get_current_principal
+from utils import encode_cursor, decode_cursor
 
 app = FastAPI()
+app.add_middleware(SQLTimingMiddleware)
 
 @app.on_event("startup")
 def on_startup():
@@ -22,7 +25,7 @@ def register(user: UserCreate, session: Session = Depends(get_session)):
     session.add(db_user)
     session.commit()
     session.refresh(db_user)
-    token = create_access_token(data={"sub": db_user.username})
+    token = create_access_token(data=token_claims(db_user))
     return {"access_token": token, "token_type": "bearer"}
 
 @app.post("/login", response_model=Token)
@@ -30,44 +33,53 @@ def login(user: UserLogin, session: Session = Depends(get_session)):
     db_user = session.exec(select(User).where(User.username == user.username)).first()
     if not db_user or not verify_password(user.password, db_user.password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = create_access_token(data={"sub": db_user.username})
+    token = create_access_token(data=token_claims(db_user))
     return {"access_token": token, "token_type": "bearer"}
 
 @app.get("/users/me")
-def get_me(current_user: User = Depends(get_current_user)):
+def get_me(current_user: Principal = Depends(get_current_principal)):
     return {"username": current_user.username, "role": current_user.role}
 
 @app.post("/notes", response_model=NoteOut)
-def create_note(note: NoteCreate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def create_note(note: NoteCreate, session: Session = Depends(get_session), current_user: Principal = Depends(get_current_principal)):
     db_note = Note(**note.dict(), owner_id=current_user.id)
     session.add(db_note)
     session.commit()
     session.refresh(db_note)
     return db_note
 
-@app.get("/notes", response_model=List[NoteOut])
+@app.get("/notes", response_model=Union[List[NoteOut], NotePage])
 def list_notes(
-    skip: int = 0,
-    limit: int = 10,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     stmt = select(Note).where(Note.owner_id == current_user.id)
     if search:
         stmt = stmt.where(Note.title.contains(search) | Note.content.contains(search))
-    stmt = stmt.offset(skip).limit(limit)
-    return session.exec(stmt).all()
+    if cursor is None:
+        stmt = stmt.offset(skip).limit(limit)
+        return session.exec(stmt).all()
+
+    after_id = decode_cursor(cursor, current_user.id)
+    if after_id is not None:
+        stmt = stmt.where(Note.id > after_id)
+    notes = session.exec(stmt.order_by(Note.id).limit(limit + 1)).all()
+    next_cursor = encode_cursor(current_user.id, notes[limit - 1].id) if len(notes) > limit else None
+    return {"items": notes[:limit], "next_cursor": next_cursor}
 
 @app.get("/notes/{note_id}", response_model=NoteOut)
-def get_note(note_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def get_note(note_id: int, session: Session = Depends(get_session), current_user: Principal = Depends(get_current_principal)):
     note = session.get(Note, note_id)
     if not note or note.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Note not found")
     return note
 
 @app.put("/notes/{note_id}", response_model=NoteOut)
-def update_note(note_id: int, note_data: NoteUpdate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def update_note(note_id: int, note_data: NoteUpdate, session: Session = Depends(get_session), current_user: Principal = Depends(get_current_principal)):
     note = session.get(Note, note_id)
     if not note or note.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Note not found")
@@ -79,7 +91,7 @@ def update_note(note_id: int, note_data: NoteUpdate, session: Session = Depends(
     return note
 
 @app.delete("/notes/{note_id}")
-def delete_note(note_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+def delete_note(note_id: int, session: Session = Depends(get_session), current_user: Principal = Depends(get_current_principal)):
     note = session.get(Note, note_id)
     if not note or note.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Note not found")
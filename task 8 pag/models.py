@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional, List
 
 class User(SQLModel, table=True):
@@ -6,9 +7,12 @@ class User(SQLModel, table=True):
     username: str = Field(unique=True, index=True)
     password: str
     role: str = Field(default="user")
+    token_version: int = Field(default=0)
     notes: List["Note"] = Relationship(back_populates="owner")
 
 class Note(SQLModel, table=True):
+    __table_args__ = (Index("ix_note_owner_id_id", "owner_id", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     content: str
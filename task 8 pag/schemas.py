@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 class UserCreate(BaseModel):
     username: str
@@ -26,3 +27,7 @@ class NoteOut(BaseModel):
     content: str
     class Config:
         orm_mode = True
+
+class NotePage(BaseModel):
+    items: List[NoteOut]
+    next_cursor: Optional[str] = None
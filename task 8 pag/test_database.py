@@ -0,0 +1,14 @@
+from sqlalchemy import inspect
+from sqlmodel import create_engine
+import database
+
+def test_init_db_adds_indexes_to_existing_tables(monkeypatch):
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE "user" (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, password VARCHAR NOT NULL, role VARCHAR NOT NULL)')
+        conn.exec_driver_sql('CREATE TABLE note (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, content VARCHAR NOT NULL, owner_id INTEGER REFERENCES "user" (id))')
+    monkeypatch.setattr(database, "engine", engine)
+
+    database.init_db()
+    database.init_db()
+    assert "ix_note_owner_id_id" in {index["name"] for index in inspect(engine).get_indexes("note")}
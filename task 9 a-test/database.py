@@ -5,7 +5,14 @@ engine = create_engine(DATABASE_URL, echo=False)
 
 def init_db():
     SQLModel.metadata.create_all(engine)
+    create_missing_indexes()
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+def create_missing_indexes():
+    # create_all skips indexes of tables that already exist
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
@@ -1,11 +1,12 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, Query
 from sqlmodel import Session, select
-from typing import List, Optional
+from typing import List, Optional, Union
 from database import init_db, get_session
 from models import User, Note
-from schemas import UserCreate, UserLogin, Token, NoteCreate, NoteUpdate, NoteOut
+from schemas import UserCreate, UserLogin, Token, NoteCreate, NoteUpdate, NoteOut, NotePage
 from auth import get_password_hash, verify_password, create_access_token
 from deps import get_current_user
+from utils import encode_cursor, decode_cursor
 
 app = FastAPI()
 
@@ -56,20 +57,29 @@ def create_note(
     return db_note
 
 
-@app.get("/notes", response_model=List[NoteOut])
+@app.get("/notes", response_model=Union[List[NoteOut], NotePage])
 def read_notes(
-    skip: int = 0,
-    limit: int = 10,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     query = select(Note).where(Note.owner_id == current_user.id)
     if search:
         query = query.where(Note.title.contains(search) | Note.content.contains(search))
-    query = query.offset(skip).limit(limit)
-    notes = session.exec(query).all()
-    return notes
+    if cursor is None:
+        query = query.offset(skip).limit(limit)
+        notes = session.exec(query).all()
+        return notes
+
+    after_id = decode_cursor(cursor, current_user.id)
+    if after_id is not None:
+        query = query.where(Note.id > after_id)
+    notes = session.exec(query.order_by(Note.id).limit(limit + 1)).all()
+    next_cursor = encode_cursor(current_user.id, notes[limit - 1].id) if len(notes) > limit else None
+    return {"items": notes[:limit], "next_cursor": next_cursor}
 
 
 @app.get("/notes/{note_id}", response_model=NoteOut)
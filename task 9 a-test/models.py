@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional, List
 
 class User(SQLModel, table=True):
@@ -11,6 +12,8 @@ class User(SQLModel, table=True):
 
 
 class Note(SQLModel, table=True):
+    __table_args__ = (Index("ix_note_owner_id_id", "owner_id", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     content: str
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class UserCreate(BaseModel):
     username: str
@@ -28,3 +28,7 @@ class NoteOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+class NotePage(BaseModel):
+    items: List[NoteOut]
+    next_cursor: Optional[str] = None
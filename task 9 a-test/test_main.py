@@ -1,8 +1,11 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import inspect
+from sqlmodel import SQLModel, create_engine, Session, select
 from main import app
+import database
 from database import get_session
+from deps import get_current_user
 from models import User, Note
 from auth import get_password_hash, create_access_token
 
@@ -82,3 +85,46 @@ def test_note_is_user_specific():
     res = client.get("/notes", headers=auth_headers(token_bob))
     assert res.status_code == 200
     assert res.json() == []
+
+def test_note_cursor_pagination():
+    register_user("carol", "secret")
+    with Session(test_engine) as session:
+        carol = session.exec(select(User).where(User.username == "carol")).first()
+    app.dependency_overrides[get_current_user] = lambda: carol
+    try:
+        for i in range(15):
+            client.post("/notes", json={"title": f"title {i}", "content": f"content {i}"})
+
+        res = client.get("/notes?cursor=&limit=10")
+        assert res.status_code == 200
+        page = res.json()
+        assert len(page["items"]) == 10
+        assert page["next_cursor"]
+
+        page = client.get(f"/notes?cursor={page['next_cursor']}&limit=10").json()
+        assert [note["title"] for note in page["items"]] == [f"title {i}" for i in range(10, 15)]
+        assert page["next_cursor"] is None
+    finally:
+        del app.dependency_overrides[get_current_user]
+
+def test_note_page_bounds_are_validated():
+    register_user("dave", "secret")
+    with Session(test_engine) as session:
+        dave = session.exec(select(User).where(User.username == "dave")).first()
+    app.dependency_overrides[get_current_user] = lambda: dave
+    try:
+        for query in ("limit=0", "limit=101", "skip=-1", "cursor=&limit=0"):
+            assert client.get(f"/notes?{query}").status_code == 422
+        assert client.get("/notes?limit=100").status_code == 200
+    finally:
+        del app.dependency_overrides[get_current_user]
+
+def test_init_db_adds_indexes_to_existing_tables(monkeypatch):
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE "user" (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, password VARCHAR NOT NULL)')
+        conn.exec_driver_sql('CREATE TABLE note (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, content VARCHAR NOT NULL, owner_id INTEGER REFERENCES "user" (id))')
+    monkeypatch.setattr(database, "engine", engine)
+
+    database.init_db()
+    assert "ix_note_owner_id_id" in {index["name"] for index in inspect(engine).get_indexes("note")}
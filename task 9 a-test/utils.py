@@ -0,0 +1,17 @@
+from fastapi import HTTPException
+import base64
+
+def encode_cursor(owner_id: int, note_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{owner_id}:{note_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, owner_id: int):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        cursor_owner, note_id = (int(part) for part in raw.split(":"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_owner != owner_id:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return note_id
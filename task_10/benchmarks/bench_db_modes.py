@@ -0,0 +1,59 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("SECRET_KEY", "benchsecret")
+os.environ.setdefault("DB_POOL_SIZE", "20")
+os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+os.environ.setdefault("DB_POOL_TIMEOUT", "120")
+
+CLIENTS = int(os.getenv("BENCH_CLIENTS", 500))
+REQUESTS_PER_CLIENT = int(os.getenv("BENCH_REQUESTS_PER_CLIENT", 4))
+
+async def run():
+    import httpx
+    from sqlmodel import SQLModel
+    from app.main import app
+    from app.database import engine, DB_ASYNC
+    from app.migrations import migrate
+
+    SQLModel.metadata.drop_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS note_fts")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS schema_version")
+        migrate(conn)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        token = (await client.post("/register", json={"username": "bench", "password": "secret"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        for i in range(50):
+            await client.post("/notes", headers=headers, json={"title": f"t{i}", "content": "c" * 200})
+
+        latencies = []
+
+        async def worker():
+            for _ in range(REQUESTS_PER_CLIENT):
+                start = time.perf_counter()
+                res = await client.get("/notes?limit=50", headers=headers)
+                latencies.append(time.perf_counter() - start)
+                res.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(CLIENTS)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    mode = "async" if DB_ASYNC else "sync"
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{mode:5} {CLIENTS} clients: {len(latencies) / elapsed:8.1f} req/s  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms")
+
+if __name__ == "__main__":
+    if "--mode" in sys.argv:
+        asyncio.run(run())
+    else:
+        for mode in ("false", "true"):
+            subprocess.run([sys.executable, __file__, "--mode"], env={**os.environ, "DB_ASYNC": mode}, check=True)
@@ -0,0 +1,50 @@
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("SECRET_KEY", "benchsecret")
+
+import httpx
+from sqlmodel import SQLModel
+from app.main import app
+from app.database import engine
+from app.migrations import migrate
+
+ROWS = int(os.getenv("BENCH_ROWS", 200_000))
+BODY_CHUNK_ROWS = 1000
+
+def reset_db():
+    SQLModel.metadata.drop_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS note_fts")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS schema_version")
+        migrate(conn)
+
+async def ndjson_body():
+    for start in range(0, ROWS, BODY_CHUNK_ROWS):
+        lines = (json.dumps({"title": f"t{i}", "content": "c" * 100}) for i in range(start, min(start + BODY_CHUNK_ROWS, ROWS)))
+        yield ("\n".join(lines) + "\n").encode()
+
+async def csv_body():
+    yield b"title,content\n"
+    for start in range(0, ROWS, BODY_CHUNK_ROWS):
+        yield "".join(f"t{i},{'c' * 100}\n" for i in range(start, min(start + BODY_CHUNK_ROWS, ROWS))).encode()
+
+async def main():
+    reset_db()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        token = (await client.post("/register", json={"username": "bench", "password": "secret"})).json()["access_token"]
+        for content_type, body in (("application/x-ndjson", ndjson_body), ("text/csv", csv_body)):
+            headers = {"Authorization": f"Bearer {token}", "Content-Type": content_type}
+            start = time.perf_counter()
+            res = await client.post("/notes/import", headers=headers, content=body())
+            res.raise_for_status()
+            elapsed = time.perf_counter() - start
+            summary = res.json()
+            print(f"{content_type:>20}: {summary['inserted']} rows in {elapsed:6.2f} s  {summary['inserted'] / elapsed:10.0f} rows/s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
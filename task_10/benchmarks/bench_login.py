@@ -0,0 +1,31 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("SECRET_KEY", "benchsecret")
+
+from app.auth import get_password_hash, verify_password, verify_password_async, shutdown_hash_executor
+
+LOGINS = int(os.getenv("BENCH_LOGINS", 200))
+THREADPOOL_SIZE = 40
+
+def bench_inline(hashed: str):
+    with ThreadPoolExecutor(max_workers=THREADPOOL_SIZE) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda _: verify_password("secret", hashed), range(LOGINS)))
+        return time.perf_counter() - start
+
+async def bench_pool(hashed: str):
+    await verify_password_async("secret", hashed)
+    start = time.perf_counter()
+    await asyncio.gather(*(verify_password_async("secret", hashed) for _ in range(LOGINS)))
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    hashed = get_password_hash("secret")
+    inline = bench_inline(hashed)
+    pooled = asyncio.run(bench_pool(hashed))
+    shutdown_hash_executor()
+    print(f"inline threadpool: {LOGINS / inline:8.1f} logins/s")
+    print(f"process pool:      {LOGINS / pooled:8.1f} logins/s")
@@ -0,0 +1,53 @@
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("SECRET_KEY", "benchsecret")
+
+import httpx
+from jose import jwt
+from sqlmodel import SQLModel, insert
+from app.main import app
+from app.database import engine
+from app.migrations import migrate
+from app.models import Note
+from app.pagination import encode_cursor
+
+PAGE_SIZE = 10
+PAGES = (1, 100, 10_000)
+ROUNDS = int(os.getenv("BENCH_ROUNDS", 20))
+
+def reset_db():
+    SQLModel.metadata.drop_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS note_fts")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS schema_version")
+        migrate(conn)
+
+async def timed(client, headers, params):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        (await client.get("/notes", headers=headers, params=params)).raise_for_status()
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+async def main():
+    reset_db()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        token = (await client.post("/register", json={"username": "bench", "password": "secret"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        owner_id = jwt.get_unverified_claims(token)["uid"]
+        rows = [{"title": f"t{i}", "content": "c" * 100, "owner_id": owner_id} for i in range(PAGE_SIZE * max(PAGES))]
+        with engine.begin() as conn:
+            conn.execute(insert(Note), rows)
+
+        for page in PAGES:
+            skip = (page - 1) * PAGE_SIZE
+            offset_ms = await timed(client, headers, {"skip": skip, "limit": PAGE_SIZE})
+            cursor = encode_cursor(owner_id, skip) if skip else ""
+            cursor_ms = await timed(client, headers, {"cursor": cursor, "limit": PAGE_SIZE})
+            print(f"page {page:>6}: offset {offset_ms:7.2f} ms  cursor {cursor_ms:7.2f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("SECRET_KEY", "benchsecret")
+
+from sqlmodel import SQLModel, Session, insert, select
+from app.database import engine
+from app.main import NOTE_OUT_COLUMNS
+from app.migrations import migrate
+from app.models import User, Note
+
+ROWS = 1000
+ROUNDS = int(os.getenv("BENCH_ROUNDS", 50))
+
+def reset_db():
+    SQLModel.metadata.drop_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS note_fts")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS schema_version")
+        migrate(conn)
+        conn.execute(insert(User), [{"id": 1, "username": "bench", "password": "x"}])
+        conn.execute(insert(Note), [{"title": f"t{i}", "content": "c" * 200, "owner_id": 1} for i in range(ROWS)])
+
+def load_orm():
+    with Session(engine) as session:
+        return [note.model_dump() for note in session.exec(select(Note).where(Note.owner_id == 1)).all()]
+
+def load_rows():
+    with Session(engine) as session:
+        return [row._asdict() for row in session.exec(select(*NOTE_OUT_COLUMNS).where(Note.owner_id == 1)).all()]
+
+def measure(load):
+    load()
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        load()
+    cpu_ms = (time.process_time() - start) / ROUNDS * 1000
+    tracemalloc.start()
+    load()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu_ms, peak
+
+def main():
+    reset_db()
+    for name, load in (("orm", load_orm), ("columns", load_rows)):
+        cpu_ms, peak = measure(load)
+        print(f"{name:>8}: {cpu_ms:6.2f} ms CPU  peak {peak / 1024:8.1f} KiB per {ROWS} rows")
+
+if __name__ == "__main__":
+    main()
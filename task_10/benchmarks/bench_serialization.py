@@ -0,0 +1,51 @@
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("SECRET_KEY", "benchsecret")
+os.environ.setdefault("NOTES_PAGE_MAX_LIMIT", "1000")
+
+import httpx
+from jose import jwt
+from sqlmodel import SQLModel, insert
+import app.main
+from app.database import engine
+from app.migrations import migrate
+from app.models import Note
+
+SIZES = (10, 100, 1000)
+ROUNDS = int(os.getenv("BENCH_ROUNDS", 50))
+
+def reset_db():
+    SQLModel.metadata.drop_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS note_fts")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS schema_version")
+        migrate(conn)
+
+async def timed(client, headers, limit):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        (await client.get("/notes", headers=headers, params={"limit": limit})).raise_for_status()
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+async def main():
+    reset_db()
+    transport = httpx.ASGITransport(app=app.main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        token = (await client.post("/register", json={"username": "bench", "password": "secret"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        owner_id = jwt.get_unverified_claims(token)["uid"]
+        with engine.begin() as conn:
+            conn.execute(insert(Note), [{"title": f"t{i}", "content": "c" * 200, "owner_id": owner_id} for i in range(max(SIZES))])
+
+        for limit in SIZES:
+            app.main.NOTES_FAST_JSON = False
+            default_ms = await timed(client, headers, limit)
+            app.main.NOTES_FAST_JSON = True
+            fast_ms = await timed(client, headers, limit)
+            print(f"{limit:>5} notes: default {default_ms:7.2f} ms  orjson {fast_ms:7.2f} ms  ({default_ms / fast_ms:4.2f}x)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,41 @@
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("SECRET_KEY", "benchsecret")
+
+from sqlalchemy import create_engine
+from sqlmodel import SQLModel
+from app.migrations import check_schema_version, migrate
+from app.search import install_search_index
+import app.models
+
+DATABASE_URL = os.environ["DATABASE_URL"]
+ROUNDS = int(os.getenv("BENCH_ROUNDS", 50))
+
+def legacy_startup():
+    engine = create_engine(DATABASE_URL)
+    with engine.begin() as conn:
+        SQLModel.metadata.create_all(conn)
+        install_search_index(conn)
+    engine.dispose()
+
+def versioned_startup():
+    engine = create_engine(DATABASE_URL)
+    with engine.connect() as conn:
+        check_schema_version(conn)
+    engine.dispose()
+
+def timed(fn):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn()
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+if __name__ == "__main__":
+    engine = create_engine(DATABASE_URL)
+    with engine.begin() as conn:
+        migrate(conn)
+    engine.dispose()
+    print(f"create_all on startup:   {timed(legacy_startup):7.2f} ms")
+    print(f"schema version check:    {timed(versioned_startup):7.2f} ms")
@@ -0,0 +1,20 @@
+import os
+import timeit
+
+os.environ.setdefault("SECRET_KEY", "benchsecret")
+
+from jose import jwt
+from app.auth import create_access_token, SECRET_KEY, ALGORITHM
+from app.token_cache import TokenCache
+
+ROUNDS = int(os.getenv("BENCH_ROUNDS", 20000))
+
+if __name__ == "__main__":
+    token = create_access_token(data={"sub": "alice"})
+    cache = TokenCache(max_bytes=1024 * 1024)
+    cache.put(token, jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]))
+
+    decode = timeit.timeit(lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]), number=ROUNDS)
+    cached = timeit.timeit(lambda: cache.get(token), number=ROUNDS)
+    print(f"jwt.decode:   {decode / ROUNDS * 1e6:8.2f} us/op")
+    print(f"cache lookup: {cached / ROUNDS * 1e6:8.2f} us/op")
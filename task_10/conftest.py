@@ -0,0 +1,34 @@
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./test.db")
+os.environ.setdefault("SECRET_KEY", "testsecret")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "2")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel
+from app.main import app
+from app.database import engine
+from app.migrations import migrate
+
+def reset_db():
+    SQLModel.metadata.drop_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP TABLE IF EXISTS note_fts")
+        conn.exec_driver_sql("DROP TABLE IF EXISTS schema_version")
+        migrate(conn)
+
+@pytest.fixture(scope="session")
+def client():
+    reset_db()
+    with TestClient(app) as c:
+        yield c
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    reset_db()
+
+@pytest.fixture
+def auth_headers(client):
+    token = client.post("/register", json={"username": "alice", "password": "secret"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,60 @@
+from fastapi import HTTPException, status
+from contextlib import asynccontextmanager
+import asyncio
+import math
+import os
+
+PASSWORD_MAX_IN_FLIGHT = int(os.getenv("PASSWORD_MAX_IN_FLIGHT", os.cpu_count() or 1))
+PASSWORD_MAX_QUEUE = int(os.getenv("PASSWORD_MAX_QUEUE", 64))
+PASSWORD_MAX_WAIT_SECONDS = float(os.getenv("PASSWORD_MAX_WAIT_SECONDS", 2))
+
+class AdmissionController:
+    def __init__(self, max_in_flight: int, max_queue: int, max_wait: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.admitted_total = 0
+        self.shed_total = 0
+
+    def _shed(self):
+        self.shed_total += 1
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Server busy, retry later",
+            headers={"Retry-After": str(max(1, math.ceil(self.max_wait)))},
+        )
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked():
+            if self.queue_depth >= self.max_queue:
+                raise self._shed()
+            self.queue_depth += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                raise self._shed()
+            finally:
+                self.queue_depth -= 1
+        else:
+            await self._semaphore.acquire()
+        self.in_flight += 1
+        self.admitted_total += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def metrics(self):
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "admitted_total": self.admitted_total,
+            "shed_total": self.shed_total,
+        }
+
+password_admission = AdmissionController(PASSWORD_MAX_IN_FLIGHT, PASSWORD_MAX_QUEUE, PASSWORD_MAX_WAIT_SECONDS)
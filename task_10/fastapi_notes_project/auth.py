@@ -1,20 +1,48 @@
 from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
 import os
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_hash_executor = None
+
 def get_password_hash(password: str):
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
+def get_hash_executor():
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+    return _hash_executor
+
+def shutdown_hash_executor():
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True)
+        _hash_executor = None
+
+async def get_password_hash_async(password: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), verify_password, plain_password, hashed_password)
+
+def token_claims(user):
+    return {"sub": user.username, "uid": user.id, "role": user.role, "ver": user.token_version}
+
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
     to_encode = data.copy()
     expire = datetime.utcnow() + expires_delta
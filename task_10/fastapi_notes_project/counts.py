@@ -0,0 +1,18 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+NOTE_COUNT = 'SELECT COUNT(*) FROM note WHERE note.owner_id = "user".id'
+RECONCILE_NOTE_COUNTS = (
+    f'UPDATE "user" SET notes_count = ({NOTE_COUNT}), notes_version = notes_version + 1 '
+    f'WHERE notes_count <> ({NOTE_COUNT})'
+)
+
+def reconcile_note_counts(connection) -> int:
+    return connection.exec_driver_sql(RECONCILE_NOTE_COUNTS).rowcount
+
+if __name__ == "__main__":
+    from app.database import engine
+    logging.basicConfig(level=logging.INFO)
+    with engine.begin() as conn:
+        logger.info("repaired note counts for %d users", reconcile_note_counts(conn))
@@ -1,12 +1,306 @@
-from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import event, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.ext.asyncio import create_async_engine
+from fastapi.concurrency import run_in_threadpool
+from app.migrations import check_schema_version
+from app.instrumentation import instrument_engine
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import asyncio
+import logging
+import math
 import os
+import threading
+import time
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL, echo=True)
+DB_ASYNC = os.getenv("DB_ASYNC", "true").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() in ("1", "true", "yes")
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+READ_YOUR_WRITES_COOKIE = "primary_until"
+REPLICA_HEALTH_INTERVAL_SECONDS = float(os.getenv("REPLICA_HEALTH_INTERVAL_SECONDS", 10))
 
-def init_db():
-    SQLModel.metadata.create_all(engine)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
 
-def get_session():
-    with Session(engine) as session:
+def to_async_url(url: str):
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+POOL_OPTIONS = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT}
+
+engine = create_engine(DATABASE_URL, echo=SQL_ECHO, **POOL_OPTIONS)
+async_engine = create_async_engine(to_async_url(DATABASE_URL), echo=SQL_ECHO, **POOL_OPTIONS) if DB_ASYNC else None
+instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine)
+DIALECT = engine.dialect.name
+sync_session_slots = asyncio.Semaphore(DB_POOL_SIZE + DB_MAX_OVERFLOW)
+
+logger = logging.getLogger(__name__)
+_primary_pins = ContextVar("primary_pins", default=None)
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_engine(url, echo=SQL_ECHO, **POOL_OPTIONS)
+        self.async_engine = create_async_engine(to_async_url(url), echo=SQL_ECHO, **POOL_OPTIONS) if DB_ASYNC else None
+        self.session_slots = asyncio.Semaphore(DB_POOL_SIZE + DB_MAX_OVERFLOW)
+        instrument_engine(self.engine)
+        if self.async_engine is not None:
+            instrument_engine(self.async_engine)
+        self.healthy = True
+
+    def ping_sync(self):
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+
+    async def ping(self):
+        if DB_ASYNC:
+            async with self.async_engine.connect() as conn:
+                await conn.exec_driver_sql("SELECT 1")
+        else:
+            await run_in_threadpool(self.ping_sync)
+
+class ReplicaRouter:
+    def __init__(self, replicas, pin_seconds: float):
+        self.replicas = replicas
+        self.pin_seconds = pin_seconds
+        self._next = 0
+        self._pinned = OrderedDict()
+        self._lock = threading.Lock()
+
+    def pin(self, key):
+        if not self.replicas:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._pinned[key] = now + self.pin_seconds
+            self._pinned.move_to_end(key)
+            while self._pinned and next(iter(self._pinned.values())) <= now:
+                self._pinned.popitem(last=False)
+
+    def is_pinned(self, key) -> bool:
+        with self._lock:
+            deadline = self._pinned.get(key)
+            if deadline is None:
+                return False
+            if deadline <= time.monotonic():
+                del self._pinned[key]
+                return False
+            return True
+
+    def choose(self, key=None):
+        if not self.replicas or (key is not None and self.is_pinned(key)):
+            return None
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = self.replicas[self._next % len(self.replicas)]
+                self._next += 1
+                if replica.healthy:
+                    return replica
+        return None
+
+    async def check_health(self):
+        for replica in self.replicas:
+            try:
+                await replica.ping()
+                replica.healthy = True
+            except Exception:
+                replica.healthy = False
+                logger.warning("replica %s failed its health check", replica.url, exc_info=True)
+
+    async def run_health_checks(self, interval: float = REPLICA_HEALTH_INTERVAL_SECONDS):
+        while True:
+            await self.check_health()
+            await asyncio.sleep(interval)
+
+replica_router = ReplicaRouter([Replica(url) for url in DATABASE_REPLICA_URLS], READ_YOUR_WRITES_SECONDS)
+
+def primary_pinned_until(cookie) -> bool:
+    try:
+        return cookie is not None and float(cookie) > time.time()
+    except ValueError:
+        return False
+
+class ReadYourWritesMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not replica_router.replicas:
+            return await self.app(scope, receive, send)
+        pins = {}
+        token = _primary_pins.set(pins)
+
+        async def send_with_pin(message):
+            if message["type"] == "http.response.start" and "until" in pins:
+                max_age = math.ceil(replica_router.pin_seconds)
+                cookie = f"{READ_YOUR_WRITES_COOKIE}={pins['until']:.3f}; Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax"
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_pin)
+        finally:
+            _primary_pins.reset(token)
+
+def pin_request_to(key):
+    pins = _primary_pins.get()
+    if pins is not None:
+        pins["key"] = key
+
+@event.listens_for(OrmSession, "do_orm_execute")
+def _track_orm_writes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(OrmSession, "after_flush")
+def _track_flush_writes(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(OrmSession, "after_commit")
+def _pin_primary_after_write(session):
+    if not session.info.pop("wrote", False):
+        return
+    pins = _primary_pins.get()
+    pin_key = session.info.get("pin_key", pins.get("key") if pins is not None else None)
+    if pin_key is not None:
+        replica_router.pin(pin_key)
+    if pins is not None:
+        pins["until"] = time.time() + replica_router.pin_seconds
+
+@event.listens_for(OrmSession, "after_rollback")
+def _forget_rolled_back_writes(session):
+    session.info.pop("wrote", None)
+
+def insert_ignore_conflicts(model, *index_elements):
+    if DIALECT == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing(index_elements=index_elements)
+    if DIALECT == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing(index_elements=index_elements)
+    return insert(model)
+
+class ThreadedSession:
+    # takes a pool slot on first use, so opening one per request costs nothing until it touches the DB
+    def __init__(self, session: Session, slots: asyncio.Semaphore):
+        self.sync_session = session
+        self._slots = slots
+        self._holds_slot = False
+
+    @property
+    def info(self):
+        return self.sync_session.info
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def _run(self, fn, *args):
+        if not self._holds_slot:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), DB_POOL_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise PoolTimeoutError(f"no session slot free after {DB_POOL_TIMEOUT} seconds")
+            self._holds_slot = True
+        return await run_in_threadpool(fn, *args)
+
+    async def exec(self, statement):
+        return await self._run(self.sync_session.exec, statement)
+
+    async def execute(self, statement, params=None):
+        return await self._run(self.sync_session.execute, statement, params)
+
+    async def get(self, entity, ident):
+        return await self._run(self.sync_session.get, entity, ident)
+
+    async def delete(self, instance):
+        await self._run(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await self._run(self.sync_session.flush)
+
+    async def commit(self):
+        await self._run(self.sync_session.commit)
+
+    async def rollback(self):
+        await self._run(self.sync_session.rollback)
+
+    async def refresh(self, instance):
+        await self._run(self.sync_session.refresh, instance)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await self._run(lambda: fn(self.sync_session, *args, **kwargs))
+
+    async def close(self):
+        try:
+            await run_in_threadpool(self.sync_session.close)
+        finally:
+            if self._holds_slot:
+                self._holds_slot = False
+                self._slots.release()
+
+def check_schema_version_sync():
+    with engine.connect() as conn:
+        check_schema_version(conn)
+
+async def init_db():
+    if DB_ASYNC:
+        async with async_engine.connect() as conn:
+            await conn.run_sync(check_schema_version)
+    else:
+        await run_in_threadpool(check_schema_version_sync)
+
+def iter_with_connection(fn, *args, bind=None):
+    with (bind or engine).connect() as conn:
+        yield from fn(conn, *args)
+
+async def aiter_with_connection(fn, *args, bind=None):
+    async with (bind or async_engine).connect() as conn:
+        async for item in fn(conn, *args):
+            yield item
+
+@asynccontextmanager
+async def open_session(bind, async_bind, slots):
+    if DB_ASYNC:
+        async with AsyncSession(async_bind, expire_on_commit=False) as session:
+            yield session
+    else:
+        session = ThreadedSession(Session(bind, expire_on_commit=False), slots)
+        try:
+            yield session
+        finally:
+            await session.close()
+
+async def get_session():
+    async with open_session(engine, async_engine, sync_session_slots) as session:
         yield session
+
+def primary_session():
+    return open_session(engine, async_engine, sync_session_slots)
+
+def choose_replica(pin_key=None, primary_until=None):
+    return None if primary_pinned_until(primary_until) else replica_router.choose(pin_key)
+
+@asynccontextmanager
+async def replica_session(replica):
+    try:
+        async with open_session(replica.engine, replica.async_engine, replica.session_slots) as session:
+            yield session
+    except OperationalError:
+        replica.healthy = False
+        raise
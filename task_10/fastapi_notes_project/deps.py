@@ -1,30 +1,83 @@
-from fastapi import Depends, HTTPException, status
+from dataclasses import dataclass
+from fastapi import Cookie, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlmodel import Session, select
-from app.database import get_session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional
+from app.database import get_session, primary_session, choose_replica, replica_session, pin_request_to, READ_YOUR_WRITES_COOKIE
 from app.models import User
+from app.token_cache import token_cache
 import os
+import threading
+import time
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
+TOKEN_VERSION_TTL_SECONDS = float(os.getenv("TOKEN_VERSION_TTL_SECONDS", 60))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+_token_versions = {}
+_token_versions_lock = threading.Lock()
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    id: int
+    username: str
+    role: str
+
+def forget_token_version(user_id: int):
+    with _token_versions_lock:
+        _token_versions.pop(user_id, None)
+
+async def _token_version_matches(user_id: int, version: int) -> bool:
+    with _token_versions_lock:
+        entry = _token_versions.get(user_id)
+    if entry is not None and entry[1] > time.monotonic() and entry[0] == version:
+        return True
+    # own short-lived session: auth must not hold a connection for the rest of the request
+    async with primary_session() as session:
+        current = (await session.exec(select(User.token_version).where(User.id == user_id))).first()
+    if current is None:
+        return False
+    with _token_versions_lock:
+        _token_versions[user_id] = (current, time.monotonic() + TOKEN_VERSION_TTL_SECONDS)
+    return current == version
+
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials"
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    payload = token_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
             raise credentials_exception
-    except JWTError:
+        token_cache.put(token, payload)
+    username = payload.get("sub")
+    user_id = payload.get("uid")
+    version = payload.get("ver")
+    if username is None or user_id is None or version is None:
         raise credentials_exception
 
-    user = session.exec(select(User).where(User.username == username)).first()
-    if user is None:
+    if not await _token_version_matches(user_id, version):
         raise credentials_exception
+    pin_request_to(user_id)
+    return Principal(id=user_id, username=username, role=payload.get("role", "user"))
+
+async def get_current_user(principal: Principal = Depends(get_current_principal), session: AsyncSession = Depends(get_session)):
+    user = await session.get(User, principal.id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
     return user
+
+async def get_read_session(principal: Principal = Depends(get_current_principal), primary_until: Optional[str] = Cookie(None, alias=READ_YOUR_WRITES_COOKIE), session: AsyncSession = Depends(get_session)):
+    replica = choose_replica(principal.id, primary_until)
+    if replica is None:
+        yield session
+        return
+    async with replica_session(replica) as read:
+        yield read
@@ -0,0 +1,23 @@
+from sqlalchemy import update
+from sqlmodel import select
+from app.models import User
+import hashlib
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+async def get_notes_state(session, owner_id: int):
+    return (await session.exec(select(User.notes_version, User.notes_count).where(User.id == owner_id))).one()
+
+async def bump_notes_version(session, owner_id: int, count_delta: int = 0):
+    values = {"notes_version": User.notes_version + 1}
+    if count_delta:
+        values["notes_count"] = User.notes_count + count_delta
+    await session.execute(update(User).where(User.id == owner_id).values(**values))
@@ -0,0 +1,43 @@
+from sqlmodel import select
+from app.models import Note
+import json
+import os
+import zlib
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+def export_statement(owner_id: int):
+    return (
+        select(Note.id, Note.title, Note.content, Note.owner_id)
+        .where(Note.owner_id == owner_id)
+        .order_by(Note.id)
+        .execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE)
+    )
+
+def encode_rows(rows) -> bytes:
+    return "".join(json.dumps(row._asdict()) + "\n" for row in rows).encode()
+
+def iter_export(connection, owner_id: int):
+    for rows in connection.execute(export_statement(owner_id)).partitions():
+        yield encode_rows(rows)
+
+async def aiter_export(connection, owner_id: int):
+    result = await connection.stream(export_statement(owner_id))
+    async for rows in result.partitions():
+        yield encode_rows(rows)
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+async def agzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,15 @@
+from fastapi import Response
+from app.schemas import NoteOut
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+NOTE_OUT_FIELDS = tuple(NoteOut.model_fields)
+
+def note_dict(note) -> dict:
+    return {field: getattr(note, field) for field in NOTE_OUT_FIELDS}
+
+def json_response(content, headers=None) -> Response:
+    return Response(orjson.dumps(content), media_type="application/json", headers=headers)
@@ -0,0 +1,132 @@
+from sqlalchemy import insert
+from pydantic import ValidationError
+from app.database import DB_ASYNC, DIALECT
+from app.etag import bump_notes_version
+from app.models import Note
+from app.schemas import NoteCreate
+import csv
+import io
+import json
+import logging
+import os
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 5000))
+IMPORT_MAX_REPORTED_REJECTS = int(os.getenv("IMPORT_MAX_REPORTED_REJECTS", 100))
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", 1024 * 1024))
+COPY_COLUMNS = ["title", "content", "owner_id", "version"]
+
+logger = logging.getLogger(__name__)
+
+def _decode_line(raw: bytes, oversized: bool):
+    if oversized or len(raw) > IMPORT_MAX_LINE_BYTES:
+        return ValueError(f"line exceeds {IMPORT_MAX_LINE_BYTES} bytes")
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        return exc
+
+async def aiter_lines(chunks):
+    buffer = bytearray()
+    oversized = False
+    async for chunk in chunks:
+        start = len(buffer)
+        buffer += chunk
+        position = 0
+        newline = buffer.find(b"\n", start)
+        while newline != -1:
+            yield _decode_line(bytes(buffer[position:newline]), oversized)
+            oversized = False
+            position = newline + 1
+            newline = buffer.find(b"\n", position)
+        del buffer[:position]
+        if len(buffer) > IMPORT_MAX_LINE_BYTES:
+            oversized = True
+            buffer.clear()
+    if buffer or oversized:
+        yield _decode_line(bytes(buffer), oversized)
+
+async def aiter_ndjson(lines):
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if isinstance(line, Exception):
+            yield line_no, line
+        elif line.strip():
+            try:
+                yield line_no, json.loads(line)
+            except ValueError as exc:
+                yield line_no, exc
+
+async def aiter_csv(lines):
+    header = None
+    record = ""
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if isinstance(line, Exception):
+            record = ""
+            yield line_no, line
+            continue
+        record += line + "\n"
+        if record.count('"') % 2:
+            continue
+        values, record = next(csv.reader([record])), ""
+        if header is None:
+            header = values
+        elif values:
+            yield line_no, dict(zip(header, values))
+
+async def copy_rows(session, rows):
+    if DIALECT == "postgresql" and DB_ASYNC:
+        connection = await session.connection()
+        raw = await connection.get_raw_connection()
+        records = [tuple(row[column] for column in COPY_COLUMNS) for row in rows]
+        await raw.driver_connection.copy_records_to_table("note", records=records, columns=COPY_COLUMNS)
+    elif DIALECT == "postgresql":
+        await session.run_sync(_copy_rows_psycopg2, rows)
+    else:
+        await session.execute(insert(Note.__table__), rows)
+
+def _copy_rows_psycopg2(sync_session, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(tuple(row[column] for column in COPY_COLUMNS) for row in rows)
+    buffer.seek(0)
+    cursor = sync_session.connection().connection.driver_connection.cursor()
+    cursor.copy_expert(f"COPY note ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+async def import_notes(session, owner_id: int, chunks, fmt: str):
+    records = aiter_csv(aiter_lines(chunks)) if fmt == "csv" else aiter_ndjson(aiter_lines(chunks))
+    inserted = 0
+    rejected = 0
+    rejects = []
+    committed_chunks = 0
+    rows = []
+
+    async def flush():
+        nonlocal inserted, committed_chunks
+        # the UPDATE opens the transaction; asyncpg's COPY would otherwise autocommit on its own
+        await bump_notes_version(session, owner_id, len(rows))
+        await copy_rows(session, rows)
+        await session.commit()
+        inserted += len(rows)
+        committed_chunks += 1
+        rows.clear()
+        logger.info("notes import for owner %s: %s rows inserted, %s rejected", owner_id, inserted, rejected)
+
+    async for line_no, record in records:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            note = NoteCreate(**record)
+        except (ValueError, TypeError, ValidationError) as exc:
+            rejected += 1
+            if len(rejects) < IMPORT_MAX_REPORTED_REJECTS:
+                rejects.append({"line": line_no, "error": str(exc)})
+            continue
+        rows.append({"title": note.title, "content": note.content, "owner_id": owner_id, "version": 1})
+        if len(rows) >= IMPORT_CHUNK_SIZE:
+            await flush()
+    if rows:
+        await flush()
+    return {"processed": inserted + rejected, "inserted": inserted, "rejected": rejected, "chunks": committed_chunks, "rejects": rejects}
@@ -1,82 +1,268 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from sqlmodel import Session, select
-from typing import List, Optional
-from app.database import init_db, get_session
+from fastapi import FastAPI, Body, Cookie, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import case, insert, update, delete
+from sqlalchemy.exc import IntegrityError, TimeoutError as PoolTimeoutError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional, Union
+import asyncio
+import os
+from app.database import init_db, get_session, insert_ignore_conflicts, iter_with_connection, aiter_with_connection, replica_router, choose_replica, ReadYourWritesMiddleware, READ_YOUR_WRITES_COOKIE, DB_ASYNC, DIALECT
 from app.models import User, Note
-from app.schemas import UserCreate, UserLogin, Token, NoteCreate, NoteUpdate, NoteOut
-from app.auth import get_password_hash, verify_password, create_access_token
-from app.deps import get_current_user
+from app.schemas import UserCreate, UserLogin, Token, NoteCreate, NoteUpdate, NoteOut, NotePage, NoteBatchUpdate, NoteBatchResult
+from app.auth import get_password_hash_async, verify_password_async, create_access_token, token_claims, shutdown_hash_executor
+from app.deps import Principal, get_current_principal, get_read_session, forget_token_version
+from app.admission import password_admission
+from app.token_cache import token_cache
+from app.pagination import encode_cursor, decode_cursor
+from app.search import apply_search
+from app.export import iter_export, aiter_export, gzip_chunks, agzip_chunks
+from app.etag import make_etag, etag_matches, get_notes_state, bump_notes_version
+from app.importer import import_notes
+from app.instrumentation import SQLTimingMiddleware
+from app.fast_json import orjson, note_dict, json_response
+
+NOTES_BATCH_MAX_ITEMS = int(os.getenv("NOTES_BATCH_MAX_ITEMS", 500))
+NOTES_PAGE_MAX_LIMIT = int(os.getenv("NOTES_PAGE_MAX_LIMIT", 100))
+NOTE_OUT_COLUMNS = (Note.id, Note.title, Note.content, Note.owner_id)
+NOTES_FAST_JSON = os.getenv("NOTES_FAST_JSON", "false").lower() in ("1", "true", "yes") and orjson is not None
 
 app = FastAPI()
+app.add_middleware(SQLTimingMiddleware)
+app.add_middleware(ReadYourWritesMiddleware)
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_exhausted(request: Request, exc: PoolTimeoutError):
+    return JSONResponse({"detail": "Database is busy, try again"}, status_code=503, headers={"Retry-After": "1"})
+
+replica_health_task = None
 
 @app.on_event("startup")
-def on_startup():
-    init_db()
+async def on_startup():
+    global replica_health_task
+    await init_db()
+    if replica_router.replicas:
+        replica_health_task = asyncio.create_task(replica_router.run_health_checks())
+
+@app.on_event("shutdown")
+def on_shutdown():
+    if replica_health_task is not None:
+        replica_health_task.cancel()
+    shutdown_hash_executor()
 
 @app.post("/register", response_model=Token)
-def register(user: UserCreate, session: Session = Depends(get_session)):
-    if session.exec(select(User).where(User.username == user.username)).first():
+async def register(user: UserCreate, session: AsyncSession = Depends(get_session)):
+    # cheap check first so duplicate sign-ups don't burn a hashing slot; the insert still guards the race
+    if (await session.exec(select(User.id).where(User.username == user.username))).first() is not None:
+        raise HTTPException(status_code=400, detail="Username already exists")
+    async with password_admission.slot():
+        hashed_pw = await get_password_hash_async(user.password)
+    values = User(username=user.username, password=hashed_pw).model_dump(exclude={"id"})
+    stmt = insert_ignore_conflicts(User, User.username).values(**values)
+    try:
+        db_user = (await session.execute(stmt.returning(User))).scalar_one_or_none()
+    except IntegrityError:
+        await session.rollback()
+        db_user = None
+    if db_user is None:
         raise HTTPException(status_code=400, detail="Username already exists")
-    hashed_pw = get_password_hash(user.password)
-    db_user = User(username=user.username, password=hashed_pw)
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
-    token = create_access_token(data={"sub": db_user.username})
+    session.info["pin_key"] = db_user.id
+    await session.commit()
+    token = create_access_token(data=token_claims(db_user))
     return {"access_token": token, "token_type": "bearer"}
 
 @app.post("/login", response_model=Token)
-def login(user: UserLogin, session: Session = Depends(get_session)):
-    db_user = session.exec(select(User).where(User.username == user.username)).first()
-    if not db_user or not verify_password(user.password, db_user.password):
+async def login(user: UserLogin, session: AsyncSession = Depends(get_session)):
+    db_user = (await session.exec(select(User).where(User.username == user.username))).first()
+    if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = create_access_token(data={"sub": db_user.username})
+    async with password_admission.slot():
+        verified = await verify_password_async(user.password, db_user.password)
+    if not verified:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    token = create_access_token(data=token_claims(db_user))
     return {"access_token": token, "token_type": "bearer"}
 
+@app.get("/metrics")
+def metrics():
+    return {"password_admission": password_admission.metrics(), "token_cache": token_cache.metrics()}
+
 @app.get("/users/me")
-def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: Principal = Depends(get_current_principal)):
     return {"username": current_user.username, "role": current_user.role}
 
+@app.post("/users/me/revoke-tokens")
+async def revoke_tokens(session: AsyncSession = Depends(get_session), current_user: Principal = Depends(get_current_principal)):
+    user = await session.get(User, current_user.id)
+    user.token_version += 1
+    session.add(user)
+    await session.commit()
+    forget_token_version(user.id)
+    return {"ok": True}
+
 @app.post("/notes", response_model=NoteOut)
-def create_note(note: NoteCreate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    db_note = Note(**note.dict(), owner_id=current_user.id)
-    session.add(db_note)
-    session.commit()
-    session.refresh(db_note)
+async def create_note(note: NoteCreate, session: AsyncSession = Depends(get_session), current_user: Principal = Depends(get_current_principal)):
+    stmt = insert(Note).values(**note.dict(), owner_id=current_user.id).returning(Note)
+    db_note = (await session.execute(stmt)).scalar_one()
+    await bump_notes_version(session, current_user.id, 1)
+    await session.commit()
     return db_note
 
-@app.get("/notes", response_model=List[NoteOut])
-def list_notes(skip: int = 0, limit: int = 10, search: Optional[str] = None, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    stmt = select(Note).where(Note.owner_id == current_user.id)
+@app.get("/notes", response_model=Union[List[NoteOut], NotePage])
+async def list_notes(response: Response, skip: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=NOTES_PAGE_MAX_LIMIT), search: Optional[str] = None, cursor: Optional[str] = None, envelope: bool = False, if_none_match: Optional[str] = Header(None), session: AsyncSession = Depends(get_read_session), current_user: Principal = Depends(get_current_principal)):
+    notes_version, total = await get_notes_state(session, current_user.id)
+    etag = make_etag("notes", current_user.id, notes_version, skip, limit, search, cursor, envelope)
+    headers = {"ETag": etag}
+    if not search:
+        headers["X-Total-Count"] = str(total)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+    stmt = select(*NOTE_OUT_COLUMNS).where(Note.owner_id == current_user.id)
     if search:
-        stmt = stmt.where(Note.title.contains(search) | Note.content.contains(search))
-    stmt = stmt.offset(skip).limit(limit)
-    return session.exec(stmt).all()
+        stmt = apply_search(stmt, search, DIALECT, ranked=cursor is None)
+    if cursor is None:
+        stmt = stmt.offset(skip).limit(limit)
+        items = [note._asdict() for note in (await session.exec(stmt)).all()]
+        next_cursor = None
+    else:
+        after_id = decode_cursor(cursor, current_user.id)
+        if after_id is not None:
+            stmt = stmt.where(Note.id > after_id)
+        notes = (await session.exec(stmt.order_by(Note.id).limit(limit + 1))).all()
+        next_cursor = encode_cursor(current_user.id, notes[limit - 1].id) if len(notes) > limit else None
+        items = [note._asdict() for note in notes[:limit]]
+
+    if cursor is None and not envelope:
+        content = items
+    else:
+        content = {"items": items, "next_cursor": next_cursor, "total": total if envelope and not search else None}
+    if NOTES_FAST_JSON:
+        return json_response(content, headers=headers)
+    return content
+
+@app.get("/notes/export")
+async def export_notes(gzip: bool = False, current_user: Principal = Depends(get_current_principal), primary_until: Optional[str] = Cookie(None, alias=READ_YOUR_WRITES_COOKIE)):
+    replica = choose_replica(current_user.id, primary_until)
+    if DB_ASYNC:
+        body = aiter_with_connection(aiter_export, current_user.id, bind=replica and replica.async_engine)
+        if gzip:
+            body = agzip_chunks(body)
+    else:
+        body = iter_with_connection(iter_export, current_user.id, bind=replica and replica.engine)
+        if gzip:
+            body = gzip_chunks(body)
+    headers = {"Content-Disposition": 'attachment; filename="notes.ndjson"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+
+def check_batch_size(items: list):
+    if len(items) > NOTES_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {NOTES_BATCH_MAX_ITEMS} items")
+
+IMPORT_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/x-ndjson": {"schema": {"type": "string"}},
+            "text/csv": {"schema": {"type": "string"}},
+        },
+    }
+}
+
+@app.post("/notes/import", openapi_extra=IMPORT_BODY)
+async def import_notes_stream(request: Request, session: AsyncSession = Depends(get_session), current_user: Principal = Depends(get_current_principal)):
+    content_type = request.headers.get("content-type", "")
+    fmt = "csv" if content_type.startswith("text/csv") else "ndjson"
+    return await import_notes(session, current_user.id, request.stream(), fmt)
+
+@app.post("/notes/batch", response_model=List[NoteBatchResult])
+async def create_notes_batch(notes: List[NoteCreate], session: AsyncSession = Depends(get_session), current_user: Principal = Depends(get_current_principal)):
+    check_batch_size(notes)
+    if not notes:
+        return []
+    rows = [{**note.dict(), "owner_id": current_user.id} for note in notes]
+    result = await session.execute(insert(Note).returning(Note, sort_by_parameter_order=True), rows)
+    created = result.scalars().all()
+    await bump_notes_version(session, current_user.id, len(created))
+    await session.commit()
+    return [{"status": 201, "id": note.id, "note": note} for note in created]
+
+@app.patch("/notes/batch", response_model=List[NoteBatchResult])
+async def update_notes_batch(notes: List[NoteBatchUpdate], session: AsyncSession = Depends(get_session), current_user: Principal = Depends(get_current_principal)):
+    check_batch_size(notes)
+    if not notes:
+        return []
+    changes = {note.id: note for note in notes}
+    stmt = (
+        update(Note)
+        .where(Note.owner_id == current_user.id, Note.id.in_(changes))
+        .values(
+            title=case({note_id: note.title for note_id, note in changes.items()}, value=Note.id),
+            content=case({note_id: note.content for note_id, note in changes.items()}, value=Note.id),
+            version=Note.version + 1,
+        )
+        .returning(*NOTE_OUT_COLUMNS, Note.version)
+        .execution_options(synchronize_session=False)
+    )
+    updated = {row.id: row._asdict() for row in (await session.execute(stmt)).all()}
+    if updated:
+        await bump_notes_version(session, current_user.id)
+    await session.commit()
+    return [
+        {"status": 200, "id": note.id, "note": updated[note.id], "version": updated[note.id]["version"]} if note.id in updated
+        else {"status": 404, "id": note.id}
+        for note in notes
+    ]
+
+@app.delete("/notes/batch", response_model=List[NoteBatchResult])
+async def delete_notes_batch(ids: List[int] = Body(...), session: AsyncSession = Depends(get_session), current_user: Principal = Depends(get_current_principal)):
+    check_batch_size(ids)
+    if not ids:
+        return []
+    stmt = delete(Note).where(Note.owner_id == current_user.id, Note.id.in_(ids)).returning(Note.id)
+    deleted = set((await session.execute(stmt)).scalars().all())
+    if deleted:
+        await bump_notes_version(session, current_user.id, -len(deleted))
+    await session.commit()
+    return [{"status": 200 if note_id in deleted else 404, "id": note_id} for note_id in ids]
 
 @app.get("/notes/{note_id}", response_model=NoteOut)
-def get_note(note_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    note = session.get(Note, note_id)
+async def get_note(note_id: int, response: Response, if_none_match: Optional[str] = Header(None), session: AsyncSession = Depends(get_read_session), current_user: Principal = Depends(get_current_principal)):
+    note = await session.get(Note, note_id)
     if not note or note.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Note not found")
+    etag = make_etag("note", note.id, note.version)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    if NOTES_FAST_JSON:
+        return json_response(note_dict(note), headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return note
 
 @app.put("/notes/{note_id}", response_model=NoteOut)
-def update_note(note_id: int, note_data: NoteUpdate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    note = session.get(Note, note_id)
-    if not note or note.owner_id != current_user.id:
+async def update_note(note_id: int, note_data: NoteUpdate, session: AsyncSession = Depends(get_session), current_user: Principal = Depends(get_current_principal)):
+    stmt = (
+        update(Note)
+        .where(Note.id == note_id, Note.owner_id == current_user.id)
+        .values(title=note_data.title, content=note_data.content, version=Note.version + 1)
+        .returning(Note)
+        .execution_options(synchronize_session=False)
+    )
+    note = (await session.execute(stmt)).scalar_one_or_none()
+    if not note:
         raise HTTPException(status_code=404, detail="Note not found")
-    note.title = note_data.title
-    note.content = note_data.content
-    session.add(note)
-    session.commit()
-    session.refresh(note)
+    await bump_notes_version(session, current_user.id)
+    await session.commit()
     return note
 
 @app.delete("/notes/{note_id}")
-def delete_note(note_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    note = session.get(Note, note_id)
-    if not note or note.owner_id != current_user.id:
+async def delete_note(note_id: int, session: AsyncSession = Depends(get_session), current_user: Principal = Depends(get_current_principal)):
+    stmt = delete(Note).where(Note.id == note_id, Note.owner_id == current_user.id).returning(Note.id)
+    if (await session.execute(stmt)).scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Note not found")
-    session.delete(note)
-    session.commit()
+    await bump_notes_version(session, current_user.id, -1)
+    await session.commit()
     return {"ok": True}
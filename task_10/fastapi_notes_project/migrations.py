@@ -0,0 +1,83 @@
+from sqlalchemy import Column, ForeignKey, Index, Integer, MetaData, String, Table, inspect
+from sqlalchemy.exc import DatabaseError
+from app.search import install_search_index
+from app.counts import reconcile_note_counts
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _initial_schema(connection):
+    metadata = MetaData()
+    user = Table(
+        "user", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("username", String, nullable=False),
+        Column("password", String, nullable=False),
+        Column("role", String, nullable=False),
+    )
+    Index("ix_user_username", user.c.username, unique=True)
+    Table(
+        "note", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("title", String, nullable=False),
+        Column("content", String, nullable=False),
+        Column("owner_id", Integer, ForeignKey("user.id"), nullable=False),
+    )
+    metadata.create_all(connection)
+
+def _add_column(table: str, column: str, ddl: str):
+    def migration(connection):
+        if column not in {c["name"] for c in inspect(connection).get_columns(table)}:
+            connection.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}')
+    return migration
+
+def _note_owner_index(connection):
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_note_owner_id_id ON note (owner_id, id)")
+
+def _user_notes_count(connection):
+    _add_column("user", "notes_count", "INTEGER NOT NULL DEFAULT 0")(connection)
+    reconcile_note_counts(connection)
+
+MIGRATIONS = [
+    (1, "initial schema", _initial_schema),
+    (2, "user token_version", _add_column("user", "token_version", "INTEGER NOT NULL DEFAULT 0")),
+    (3, "note (owner_id, id) index", _note_owner_index),
+    (4, "note full-text search index", install_search_index),
+    (5, "note version", _add_column("note", "version", "INTEGER NOT NULL DEFAULT 1")),
+    (6, "user notes_version", _add_column("user", "notes_version", "INTEGER NOT NULL DEFAULT 0")),
+    (7, "user notes_count", _user_notes_count),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def current_version(connection):
+    try:
+        return connection.exec_driver_sql("SELECT version FROM schema_version").scalar() or 0
+    except DatabaseError:
+        connection.rollback()
+        return 0
+
+def migrate(connection):
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("SELECT pg_advisory_xact_lock(hashtext('schema_version'))")
+    connection.exec_driver_sql("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)")
+    version = connection.exec_driver_sql("SELECT version FROM schema_version").scalar()
+    if version is None:
+        connection.exec_driver_sql("INSERT INTO schema_version (version) VALUES (0)")
+        version = 0
+    for number, description, apply in MIGRATIONS:
+        if number > version:
+            logger.info("applying migration %d: %s", number, description)
+            apply(connection)
+            connection.exec_driver_sql(f"UPDATE schema_version SET version = {number}")
+    return LATEST_VERSION
+
+def check_schema_version(connection):
+    version = current_version(connection)
+    if version < LATEST_VERSION:
+        raise RuntimeError(f"Database schema is at version {version}, expected {LATEST_VERSION}. Run `python -m app.migrations` first.")
+
+if __name__ == "__main__":
+    from app.database import engine
+    logging.basicConfig(level=logging.INFO)
+    with engine.begin() as conn:
+        migrate(conn)
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional, List
 
 class User(SQLModel, table=True):
@@ -6,11 +7,17 @@ class User(SQLModel, table=True):
     username: str = Field(index=True, unique=True)
     password: str
     role: str = "user"
+    token_version: int = 0
+    notes_version: int = 0
+    notes_count: int = 0
     notes: List["Note"] = Relationship(back_populates="owner")
 
 class Note(SQLModel, table=True):
+    __table_args__ = (Index("ix_note_owner_id_id", "owner_id", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     content: str
     owner_id: int = Field(foreign_key="user.id")
+    version: int = 1
     owner: Optional[User] = Relationship(back_populates="notes")
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 class UserCreate(BaseModel):
     username: str
@@ -23,3 +24,17 @@ class NoteUpdate(BaseModel):
 class NoteOut(NoteCreate):
     id: int
     owner_id: int
+
+class NotePage(BaseModel):
+    items: List[NoteOut]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+class NoteBatchUpdate(NoteUpdate):
+    id: int
+
+class NoteBatchResult(BaseModel):
+    status: int
+    id: Optional[int] = None
+    note: Optional[NoteOut] = None
+    version: Optional[int] = None
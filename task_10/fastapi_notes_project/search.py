@@ -0,0 +1,47 @@
+from sqlalchemy import column, func, literal_column, table, text
+from app.models import Note
+
+POSTGRES_DDL = [
+    "ALTER TABLE note ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(content, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_note_search_vector ON note USING GIN (search_vector)",
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5(title, content, content='note', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS note_fts_ai AFTER INSERT ON note BEGIN "
+    "INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS note_fts_ad AFTER DELETE ON note BEGIN "
+    "INSERT INTO note_fts(note_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS note_fts_au AFTER UPDATE ON note BEGIN "
+    "INSERT INTO note_fts(note_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content); END",
+]
+
+note_fts = table("note_fts", column("rowid"), column("rank"))
+search_vector = literal_column("note.search_vector")
+
+def install_search_index(connection):
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        for statement in POSTGRES_DDL:
+            connection.exec_driver_sql(statement)
+    elif dialect == "sqlite":
+        exists = connection.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'note_fts'").first()
+        for statement in SQLITE_DDL:
+            connection.exec_driver_sql(statement)
+        if not exists:
+            connection.exec_driver_sql("INSERT INTO note_fts(note_fts) VALUES ('rebuild')")
+
+def fts5_query(search: str):
+    return " ".join('"' + term.replace('"', '""') + '"*' for term in search.split())
+
+def apply_search(stmt, search: str, dialect: str, ranked: bool = True):
+    if dialect == "postgresql":
+        query = func.websearch_to_tsquery("simple", search)
+        stmt = stmt.where(search_vector.op("@@")(query))
+        return stmt.order_by(func.ts_rank(search_vector, query).desc()) if ranked else stmt
+    if dialect == "sqlite" and search.strip():
+        stmt = stmt.join(note_fts, note_fts.c.rowid == Note.id).where(text("note_fts MATCH :fts_query").bindparams(fts_query=fts5_query(search)))
+        return stmt.order_by(note_fts.c.rank) if ranked else stmt
+    return stmt.where(Note.title.contains(search) | Note.content.contains(search))
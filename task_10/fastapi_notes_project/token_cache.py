@@ -0,0 +1,71 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+import time
+
+TOKEN_CACHE_MAX_BYTES = int(os.getenv("TOKEN_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+ENTRY_OVERHEAD_BYTES = 200
+
+class TokenCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, token: str):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, exp, size = entry
+            if exp <= time.time():
+                del self._entries[key]
+                self.size_bytes -= size
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, token: str, payload: dict):
+        exp = payload.get("exp")
+        if exp is None:
+            return
+        key = self._key(token)
+        size = len(key) + len(json.dumps(payload, default=str)) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size_bytes -= old[2]
+            self._entries[key] = (payload, exp, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def metrics(self):
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+token_cache = TokenCache(TOKEN_CACHE_MAX_BYTES)
@@ -0,0 +1,110 @@
+import asyncio
+import time
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+from app.auth import get_password_hash_async, verify_password_async
+from app.admission import AdmissionController
+from app.token_cache import TokenCache, token_cache
+
+def test_register_and_login(client):
+    res = client.post("/register", json={"username": "alice", "password": "secret"})
+    assert res.status_code == 200
+    assert "access_token" in res.json()
+
+    res = client.post("/login", json={"username": "alice", "password": "secret"})
+    assert res.status_code == 200
+    assert "access_token" in res.json()
+
+def test_register_duplicate_username(client, monkeypatch):
+    client.post("/register", json={"username": "alice", "password": "secret"})
+    hashed = []
+    monkeypatch.setattr("app.main.get_password_hash_async", lambda password: hashed.append(password))
+    res = client.post("/register", json={"username": "alice", "password": "other"})
+    assert res.status_code == 400
+    assert hashed == []
+
+def test_login_wrong_password(client):
+    client.post("/register", json={"username": "alice", "password": "secret"})
+    res = client.post("/login", json={"username": "alice", "password": "wrong"})
+    assert res.status_code == 401
+
+def test_hash_helpers_run_in_pool():
+    async def run():
+        hashed = await get_password_hash_async("secret")
+        return await verify_password_async("secret", hashed), await verify_password_async("nope", hashed)
+    assert asyncio.run(run()) == (True, False)
+
+def test_admission_sheds_after_max_wait():
+    controller = AdmissionController(max_in_flight=1, max_queue=4, max_wait=0.05)
+
+    async def run():
+        async with controller.slot():
+            with pytest.raises(HTTPException) as exc:
+                async with controller.slot():
+                    pass
+        return exc.value
+
+    exc = asyncio.run(run())
+    assert exc.status_code == 429
+    assert exc.headers["Retry-After"] == "1"
+    assert controller.metrics() == {"in_flight": 0, "queue_depth": 0, "admitted_total": 1, "shed_total": 1}
+
+def test_admission_sheds_when_queue_full():
+    controller = AdmissionController(max_in_flight=1, max_queue=0, max_wait=5)
+
+    async def run():
+        async with controller.slot():
+            with pytest.raises(HTTPException):
+                async with controller.slot():
+                    pass
+
+    asyncio.run(run())
+    assert controller.shed_total == 1
+
+def test_metrics_endpoint(client):
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert "queue_depth" in res.json()["password_admission"]
+
+def test_token_cache_hits_and_expiry():
+    cache = TokenCache(max_bytes=4096)
+    cache.put("valid", {"sub": "alice", "exp": time.time() + 60})
+    cache.put("expired", {"sub": "bob", "exp": time.time() - 1})
+    assert cache.get("valid")["sub"] == "alice"
+    assert cache.get("expired") is None
+    assert cache.get("unknown") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.metrics()["entries"] == 1
+
+def test_token_cache_evicts_lru_by_size():
+    cache = TokenCache(max_bytes=600)
+    for name in ("a", "b", "c"):
+        cache.put(name, {"sub": name, "exp": time.time() + 60})
+    assert cache.size_bytes <= 600
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+
+def test_authenticated_requests_hit_token_cache(client, auth_headers):
+    token_cache.clear()
+    client.get("/users/me", headers=auth_headers)
+    hits = token_cache.hits
+    res = client.get("/users/me", headers=auth_headers)
+    assert res.status_code == 200
+    assert token_cache.hits == hits + 1
+
+def test_token_carries_principal_claims(client, auth_headers):
+    token = auth_headers["Authorization"].split()[1]
+    claims = jwt.get_unverified_claims(token)
+    assert claims["sub"] == "alice"
+    assert claims["role"] == "user"
+    assert claims["ver"] == 0
+    assert isinstance(claims["uid"], int)
+
+def test_revoked_tokens_are_rejected(client, auth_headers):
+    assert client.post("/users/me/revoke-tokens", headers=auth_headers).status_code == 200
+    assert client.get("/users/me", headers=auth_headers).status_code == 401
+
+    token = client.post("/login", json={"username": "alice", "password": "secret"}).json()["access_token"]
+    res = client.get("/users/me", headers={"Authorization": f"Bearer {token}"})
+    assert res.status_code == 200
@@ -0,0 +1,48 @@
+import json
+import os
+import pytest
+from sqlalchemy import create_engine
+from sqlmodel import SQLModel
+from app.export import iter_export
+
+EXPORT_ROWS = 1_000_000
+RSS_CEILING_BYTES = 64 * 1024 * 1024
+
+def current_rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * 4096
+
+def test_export_streams_ndjson(client, auth_headers):
+    client.post("/notes/batch", headers=auth_headers, json=[{"title": f"t{i}", "content": "c"} for i in range(5)])
+
+    res = client.get("/notes/export", headers=auth_headers)
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    notes = [json.loads(line) for line in res.text.splitlines()]
+    assert [note["title"] for note in notes] == [f"t{i}" for i in range(5)]
+
+    res = client.get("/notes/export?gzip=true", headers=auth_headers)
+    assert res.headers["content-encoding"] == "gzip"
+    assert len(res.text.splitlines()) == 5
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="needs /proc to sample RSS")
+def test_export_million_notes_under_rss_ceiling(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'export.db'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO user (id, username, password, role, token_version, notes_version, notes_count) VALUES (1, 'bulk', 'x', 'user', 0, 0, 0)")
+        conn.exec_driver_sql(
+            "WITH RECURSIVE seq(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM seq LIMIT ?) "
+            "INSERT INTO note (title, content, owner_id, version) SELECT 'title ' || x, 'content of note ' || x, 1, 1 FROM seq",
+            (EXPORT_ROWS,),
+        )
+
+    baseline = current_rss()
+    peak = baseline
+    lines = 0
+    with engine.connect() as conn:
+        for chunk in iter_export(conn, 1):
+            lines += chunk.count(b"\n")
+            peak = max(peak, current_rss())
+    assert lines == EXPORT_ROWS
+    assert peak - baseline < RSS_CEILING_BYTES
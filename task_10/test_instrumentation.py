@@ -0,0 +1,33 @@
+import logging
+import re
+from app.instrumentation import RequestStats, report_n_plus_one, statement_shape
+
+def test_server_timing_header(client, auth_headers):
+    res = client.get("/notes", headers=auth_headers)
+    match = re.fullmatch(r'db;dur=([\d.]+);desc="(\d+) queries"', res.headers["server-timing"])
+    assert match
+    assert int(match.group(2)) >= 1
+
+def test_slow_query_logged_with_route(client, auth_headers, monkeypatch, caplog):
+    monkeypatch.setattr("app.instrumentation.SLOW_QUERY_MS", 0)
+    monkeypatch.setattr("app.instrumentation.N_PLUS_ONE_THRESHOLD", 2)
+    note_id = client.post("/notes", headers=auth_headers, json={"title": "t", "content": "c"}).json()["id"]
+
+    with caplog.at_level(logging.WARNING, logger="sql"):
+        client.get(f"/notes/{note_id}", headers=auth_headers)
+    assert any("slow query" in record.message and "/notes/{note_id}" in record.message for record in caplog.records)
+    assert not any("N+1" in record.message for record in caplog.records)
+
+
+def test_n_plus_one_detector(monkeypatch, caplog):
+    monkeypatch.setattr("app.instrumentation.N_PLUS_ONE_THRESHOLD", 2)
+    stats = RequestStats({"path": "/notes"})
+    for note_id in range(3):
+        stats.statements[statement_shape(f"SELECT title FROM note WHERE id = {note_id}")] += 1
+    stats.statements[statement_shape("SELECT 1")] += 1
+
+    with caplog.at_level(logging.WARNING, logger="sql"):
+        report_n_plus_one(stats)
+    assert [record.message for record in caplog.records] == [
+        "possible N+1 on /notes: 3 near-identical statements: SELECT title FROM note WHERE id = ?"
+    ]
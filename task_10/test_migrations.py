@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+from app.migrations import LATEST_VERSION, check_schema_version, current_version, migrate
+
+def test_migrate_fresh_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    with engine.connect() as conn:
+        with pytest.raises(RuntimeError):
+            check_schema_version(conn)
+
+    with engine.begin() as conn:
+        migrate(conn)
+    with engine.begin() as conn:
+        migrate(conn)
+
+    with engine.connect() as conn:
+        assert current_version(conn) == LATEST_VERSION
+        check_schema_version(conn)
+        indexes = {index["name"] for index in inspect(conn).get_indexes("note")}
+        assert "ix_note_owner_id_id" in indexes
+
+def test_migrate_adopts_legacy_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE "user" (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL, password VARCHAR NOT NULL, role VARCHAR NOT NULL)')
+        conn.exec_driver_sql('INSERT INTO "user" (username, password, role) VALUES (\'alice\', \'x\', \'user\')')
+
+    with engine.begin() as conn:
+        migrate(conn)
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql('SELECT token_version FROM "user"').scalar() == 0
@@ -0,0 +1,274 @@
+import asyncio
+import json
+from sqlalchemy.ext.asyncio import create_async_engine
+from app import database
+from app.counts import reconcile_note_counts
+from app.importer import import_notes
+from app.database import engine
+
+def test_create_and_list_notes(client, auth_headers):
+    res = client.post("/notes", headers=auth_headers, json={"title": "Note 1", "content": "Test content"})
+    assert res.status_code == 200
+    assert res.json()["title"] == "Note 1"
+
+    res = client.get("/notes", headers=auth_headers)
+    assert res.status_code == 200
+    assert len(res.json()) == 1
+
+def test_note_filter_and_pagination(client, auth_headers):
+    for i in range(20):
+        client.post("/notes", headers=auth_headers, json={"title": f"title {i}", "content": f"content {i}"})
+
+    res = client.get("/notes?skip=5&limit=10", headers=auth_headers)
+    assert res.status_code == 200
+    assert len(res.json()) == 10
+
+    res = client.get("/notes?search=title 1", headers=auth_headers)
+    assert res.status_code == 200
+    assert any("title 1" in note["title"] for note in res.json())
+
+def test_update_and_delete_note(client, auth_headers):
+    note_id = client.post("/notes", headers=auth_headers, json={"title": "a", "content": "b"}).json()["id"]
+
+    res = client.put(f"/notes/{note_id}", headers=auth_headers, json={"title": "c", "content": "d"})
+    assert res.status_code == 200
+    assert res.json()["title"] == "c"
+    assert client.get(f"/notes/{note_id}", headers=auth_headers).json()["content"] == "d"
+
+    assert client.delete(f"/notes/{note_id}", headers=auth_headers).json() == {"ok": True}
+    assert client.get(f"/notes/{note_id}", headers=auth_headers).status_code == 404
+
+def test_note_is_user_specific(client, auth_headers):
+    token_bob = client.post("/register", json={"username": "bob", "password": "secret"}).json()["access_token"]
+    bob_headers = {"Authorization": f"Bearer {token_bob}"}
+    note_id = client.post("/notes", headers=auth_headers, json={"title": "Private", "content": "Only mine"}).json()["id"]
+
+    assert client.get("/notes", headers=bob_headers).json() == []
+    assert client.get(f"/notes/{note_id}", headers=bob_headers).status_code == 404
+    assert client.put(f"/notes/{note_id}", headers=bob_headers, json={"title": "x", "content": "y"}).status_code == 404
+    assert client.delete(f"/notes/{note_id}", headers=bob_headers).status_code == 404
+    assert client.get(f"/notes/{note_id}", headers=auth_headers).json()["title"] == "Private"
+
+def test_cursor_pagination(client, auth_headers):
+    for i in range(25):
+        client.post("/notes", headers=auth_headers, json={"title": f"title {i}", "content": "c"})
+
+    titles = []
+    cursor = ""
+    while cursor is not None:
+        res = client.get("/notes", headers=auth_headers, params={"cursor": cursor, "limit": 10})
+        assert res.status_code == 200
+        page = res.json()
+        titles += [note["title"] for note in page["items"]]
+        cursor = page["next_cursor"]
+    assert titles == [f"title {i}" for i in range(25)]
+
+def test_cursor_from_other_user_is_rejected(client, auth_headers):
+    token_bob = client.post("/register", json={"username": "bob", "password": "secret"}).json()["access_token"]
+    client.post("/notes", headers=auth_headers, json={"title": "a", "content": "b"})
+    client.post("/notes", headers=auth_headers, json={"title": "c", "content": "d"})
+    cursor = client.get("/notes", headers=auth_headers, params={"cursor": "", "limit": 1}).json()["next_cursor"]
+
+    res = client.get("/notes", headers={"Authorization": f"Bearer {token_bob}"}, params={"cursor": cursor})
+    assert res.status_code == 400
+    assert client.get("/notes", headers=auth_headers, params={"cursor": "garbage!"}).status_code == 400
+
+def test_page_bounds_are_validated(client, auth_headers):
+    for params in ({"limit": 0}, {"limit": 101}, {"skip": -1}, {"cursor": "", "limit": 0}):
+        assert client.get("/notes", headers=auth_headers, params=params).status_code == 422
+    assert client.get("/notes", headers=auth_headers, params={"limit": 100}).status_code == 200
+
+def test_search_is_ranked_and_tracks_updates(client, auth_headers):
+    client.post("/notes", headers=auth_headers, json={"title": "groceries", "content": "milk and bread"})
+    client.post("/notes", headers=auth_headers, json={"title": "bread bread", "content": "bread recipe"})
+    other_id = client.post("/notes", headers=auth_headers, json={"title": "todo", "content": "call bob"}).json()["id"]
+
+    res = client.get("/notes?search=bread", headers=auth_headers)
+    assert [note["title"] for note in res.json()] == ["bread bread", "groceries"]
+
+    client.put(f"/notes/{other_id}", headers=auth_headers, json={"title": "todo", "content": "buy bread"})
+    client.delete(f"/notes/{other_id - 2}", headers=auth_headers)
+    res = client.get("/notes?search=bread", headers=auth_headers)
+    assert {note["title"] for note in res.json()} == {"bread bread", "todo"}
+
+def test_batch_create_update_delete(client, auth_headers):
+    res = client.post("/notes/batch", headers=auth_headers, json=[{"title": f"t{i}", "content": "c"} for i in range(3)])
+    assert res.status_code == 200
+    created = res.json()
+    assert [item["status"] for item in created] == [201, 201, 201]
+    assert [item["note"]["title"] for item in created] == ["t0", "t1", "t2"]
+    ids = [item["id"] for item in created]
+
+    res = client.patch("/notes/batch", headers=auth_headers, json=[
+        {"id": ids[0], "title": "new", "content": "x"},
+        {"id": 999999, "title": "missing", "content": "x"},
+    ])
+    assert [item["status"] for item in res.json()] == [200, 404]
+    assert res.json()[0]["note"] == {"id": ids[0], "title": "new", "content": "x", "owner_id": created[0]["note"]["owner_id"]}
+    assert res.json()[0]["version"] == 2
+    assert client.get(f"/notes/{ids[0]}", headers=auth_headers).json()["title"] == "new"
+
+    res = client.request("DELETE", "/notes/batch", headers=auth_headers, json=[ids[1], 999999])
+    assert [item["status"] for item in res.json()] == [200, 404]
+    assert len(client.get("/notes", headers=auth_headers).json()) == 2
+
+def test_batch_respects_ownership_and_size(client, auth_headers):
+    note_id = client.post("/notes", headers=auth_headers, json={"title": "mine", "content": "c"}).json()["id"]
+    token_bob = client.post("/register", json={"username": "bob", "password": "secret"}).json()["access_token"]
+    bob_headers = {"Authorization": f"Bearer {token_bob}"}
+
+    res = client.patch("/notes/batch", headers=bob_headers, json=[{"id": note_id, "title": "stolen", "content": "c"}])
+    assert res.json()[0]["status"] == 404
+    res = client.request("DELETE", "/notes/batch", headers=bob_headers, json=[note_id])
+    assert res.json()[0]["status"] == 404
+    assert client.get(f"/notes/{note_id}", headers=auth_headers).json()["title"] == "mine"
+
+    res = client.post("/notes/batch", headers=auth_headers, json=[{"title": "t", "content": "c"}] * 501)
+    assert res.status_code == 413
+
+def test_list_etag_and_not_modified(client, auth_headers):
+    client.post("/notes", headers=auth_headers, json={"title": "a", "content": "b"})
+    res = client.get("/notes", headers=auth_headers)
+    etag = res.headers["ETag"]
+
+    res = client.get("/notes", headers={**auth_headers, "If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.content == b""
+
+    assert client.get("/notes?limit=5", headers={**auth_headers, "If-None-Match": etag}).status_code == 200
+
+    client.post("/notes", headers=auth_headers, json={"title": "c", "content": "d"})
+    res = client.get("/notes", headers={**auth_headers, "If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+
+def test_note_etag_changes_on_update(client, auth_headers):
+    note_id = client.post("/notes", headers=auth_headers, json={"title": "a", "content": "b"}).json()["id"]
+    etag = client.get(f"/notes/{note_id}", headers=auth_headers).headers["ETag"]
+    assert client.get(f"/notes/{note_id}", headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+
+    client.patch("/notes/batch", headers=auth_headers, json=[{"id": note_id, "title": "x", "content": "y"}])
+    res = client.get(f"/notes/{note_id}", headers={**auth_headers, "If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.json()["title"] == "x"
+    assert res.headers["ETag"] != etag
+
+def test_import_ndjson_and_csv(client, auth_headers, monkeypatch):
+    monkeypatch.setattr("app.importer.IMPORT_CHUNK_SIZE", 1)
+    body = "\n".join([
+        json.dumps({"title": "a", "content": "first"}),
+        "not json",
+        json.dumps({"title": "b"}),
+        json.dumps({"title": "c", "content": "third"}),
+    ])
+    res = client.post("/notes/import", headers={**auth_headers, "Content-Type": "application/x-ndjson"}, content=body)
+    assert res.status_code == 200
+    summary = res.json()
+    assert summary["inserted"] == 2
+    assert summary["rejected"] == 2
+    assert summary["chunks"] == 2
+    assert [reject["line"] for reject in summary["rejects"]] == [2, 3]
+
+    body = 'title,content\nd,"multi\nline"\ne,"with ""quotes"""\n'
+    res = client.post("/notes/import", headers={**auth_headers, "Content-Type": "text/csv"}, content=body)
+    assert res.json()["inserted"] == 2
+
+    notes = client.get("/notes?limit=10", headers=auth_headers).json()
+    assert [note["content"] for note in notes] == ["first", "third", "multi\nline", 'with "quotes"']
+
+def test_import_rejects_undecodable_and_oversized_lines(client, auth_headers, monkeypatch):
+    monkeypatch.setattr("app.importer.IMPORT_MAX_LINE_BYTES", 64)
+    ok = json.dumps({"title": "ok", "content": "c"}).encode()
+    body = b"\n".join([ok, b'{"title": "\xff", "content": "c"}', json.dumps({"title": "x" * 100, "content": "c"}).encode(), ok])
+    chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+    res = client.post("/notes/import", headers={**auth_headers, "Content-Type": "application/x-ndjson"}, content=iter(chunks))
+    assert res.status_code == 200
+    summary = res.json()
+    assert (summary["processed"], summary["inserted"], summary["rejected"]) == (4, 2, 2)
+    assert [reject["line"] for reject in summary["rejects"]] == [2, 3]
+    assert "exceeds 64 bytes" in summary["rejects"][1]["error"]
+
+class RecordingAsyncpgSession:
+    def __init__(self):
+        self.calls = []
+        self.driver_connection = self
+
+    async def execute(self, statement, params=None):
+        self.calls.append(statement.__visit_name__)
+
+    async def connection(self):
+        return self
+
+    async def get_raw_connection(self):
+        return self
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.calls.append(f"copy {len(records)}")
+
+    async def commit(self):
+        self.calls.append("commit")
+
+def test_import_copy_runs_inside_the_counter_transaction(monkeypatch):
+    # asyncpg only begins a transaction on the first execute, so the counter UPDATE must come before COPY
+    monkeypatch.setattr("app.importer.DIALECT", "postgresql")
+    monkeypatch.setattr("app.importer.DB_ASYNC", True)
+    monkeypatch.setattr("app.importer.IMPORT_CHUNK_SIZE", 2)
+    session = RecordingAsyncpgSession()
+
+    async def chunks():
+        yield b"\n".join(json.dumps({"title": f"t{i}", "content": "c"}).encode() for i in range(3))
+
+    summary = asyncio.run(import_notes(session, 1, chunks(), "ndjson"))
+    assert summary["inserted"] == 3
+    assert session.calls == ["update", "copy 2", "commit", "update", "copy 1", "commit"]
+
+def test_fast_json_matches_default_serialization(client, auth_headers, monkeypatch):
+    client.post("/notes/batch", headers=auth_headers, json=[{"title": f"t{i}", "content": "c"} for i in range(3)])
+    paths = ["/notes?limit=10", "/notes?cursor=&limit=2", "/notes/1"]
+    default = [client.get(path, headers=auth_headers) for path in paths]
+
+    monkeypatch.setattr("app.main.NOTES_FAST_JSON", True)
+    fast = [client.get(path, headers=auth_headers) for path in paths]
+    assert [res.json() for res in fast] == [res.json() for res in default]
+    assert [res.headers["etag"] for res in fast] == [res.headers["etag"] for res in default]
+
+    schema = client.get("/openapi.json").json()["paths"]["/notes/{note_id}"]["get"]["responses"]["200"]
+    assert schema["content"]["application/json"]["schema"] == {"$ref": "#/components/schemas/NoteOut"}
+
+def test_total_count_maintained_and_reconciled(client, auth_headers):
+    ids = [note["id"] for note in client.post("/notes/batch", headers=auth_headers, json=[{"title": f"t{i}", "content": "c"} for i in range(4)]).json()]
+    client.post("/notes", headers=auth_headers, json={"title": "one", "content": "c"})
+    client.delete(f"/notes/{ids[0]}", headers=auth_headers)
+    client.request("DELETE", "/notes/batch", headers=auth_headers, json=ids[1:3])
+    client.delete(f"/notes/{ids[0]}", headers=auth_headers)
+
+    res = client.get("/notes?limit=1", headers=auth_headers)
+    assert res.headers["x-total-count"] == "2"
+    assert len(res.json()) == 1
+    res = client.get("/notes?limit=1&envelope=true", headers=auth_headers)
+    assert res.json()["total"] == 2
+    assert res.json()["items"] == client.get("/notes?limit=1", headers=auth_headers).json()
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql('UPDATE "user" SET notes_count = 7')
+        assert reconcile_note_counts(conn) == 1
+        assert reconcile_note_counts(conn) == 0
+    assert client.get("/notes", headers=auth_headers).headers["x-total-count"] == "2"
+
+def test_exhausted_pool_returns_503(client, auth_headers, monkeypatch):
+    monkeypatch.setattr("app.deps.TOKEN_VERSION_TTL_SECONDS", 0)
+    monkeypatch.setattr("app.database.DB_POOL_TIMEOUT", 0.1)
+    monkeypatch.setattr("app.database.sync_session_slots", asyncio.Semaphore(0))
+    small_engine = held = None
+    if database.DB_ASYNC:
+        small_engine = create_async_engine(database.to_async_url(database.DATABASE_URL), pool_size=1, max_overflow=0, pool_timeout=0.1)
+        monkeypatch.setattr("app.database.async_engine", small_engine)
+        held = client.portal.call(small_engine.connect().start)
+    try:
+        res = client.get("/notes", headers=auth_headers)
+        assert res.status_code == 503
+        assert res.headers["retry-after"] == "1"
+    finally:
+        if small_engine is not None:
+            client.portal.call(held.close)
+            client.portal.call(small_engine.dispose)
@@ -0,0 +1,63 @@
+import asyncio
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.ext.asyncio import create_async_engine
+from app import database
+from app.database import Replica, ReplicaRouter
+
+def test_router_round_robin_health_and_pinning(tmp_path):
+    first = Replica(f"sqlite:///{tmp_path / 'first.db'}")
+    second = Replica(f"sqlite:///{tmp_path / 'second.db'}")
+    broken = Replica(f"sqlite:///{tmp_path / 'missing' / 'broken.db'}")
+    router = ReplicaRouter([first, broken, second], pin_seconds=60)
+
+    asyncio.run(router.check_health())
+    assert not broken.healthy
+    assert [router.choose() for _ in range(4)] == [first, second, first, second]
+
+    router.pin(1)
+    assert router.choose(1) is None
+    assert router.choose(2) is not None
+
+def test_reads_pinned_to_primary_after_write(client, auth_headers, monkeypatch, tmp_path):
+    client.post("/notes", headers=auth_headers, json={"title": "before", "content": "c"})
+    shutil.copy("test.db", tmp_path / "replica.db")
+    replica = Replica(f"sqlite:///{tmp_path / 'replica.db'}")
+    monkeypatch.setattr("app.database.replica_router", ReplicaRouter([replica], pin_seconds=0.5))
+    try:
+        response = client.post("/notes", headers=auth_headers, json={"title": "after", "content": "c"})
+        assert "primary_until" in response.cookies
+        assert [note["title"] for note in client.get("/notes", headers=auth_headers).json()] == ["before", "after"]
+
+        # another worker has no in-process pin; the cookie still routes the read to the primary
+        monkeypatch.setattr("app.database.replica_router", ReplicaRouter([replica], pin_seconds=0.5))
+        assert [note["title"] for note in client.get("/notes", headers=auth_headers).json()] == ["before", "after"]
+
+        time.sleep(0.6)
+        assert [note["title"] for note in client.get("/notes", headers=auth_headers).json()] == ["before"]
+
+        replica.healthy = False
+        assert [note["title"] for note in client.get("/notes", headers=auth_headers).json()] == ["before", "after"]
+    finally:
+        replica.engine.dispose()
+        if replica.async_engine is not None:
+            client.portal.call(replica.async_engine.dispose)
+        client.cookies.clear()
+
+def test_concurrent_reads_fit_in_a_small_pool(client, auth_headers, monkeypatch):
+    # auth and the read used to hold two connections per request and starve each other
+    monkeypatch.setattr("app.deps.TOKEN_VERSION_TTL_SECONDS", 0)
+    monkeypatch.setattr("app.database.sync_session_slots", asyncio.Semaphore(3))
+    small_engine = None
+    if database.DB_ASYNC:
+        small_engine = create_async_engine(database.to_async_url(database.DATABASE_URL), pool_size=2, max_overflow=1, pool_timeout=5)
+        monkeypatch.setattr("app.database.async_engine", small_engine)
+    client.post("/notes", headers=auth_headers, json={"title": "t", "content": "c"})
+    try:
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            futures = [pool.submit(client.get, "/notes", headers=auth_headers) for _ in range(10)]
+            assert [future.result(timeout=30).status_code for future in futures] == [200] * 10
+    finally:
+        if small_engine is not None:
+            client.portal.call(small_engine.dispose)
@@ -0,0 +1,285 @@
+from urllib.parse import urlencode
+from dataclasses import dataclass
+from fastapi import Response
+from app import redis_client
+from app.local_cache import local_cache
+import asyncio
+import gzip
+import json
+import logging
+import math
+import os
+import random
+import time
+import uuid
+
+TAG_PREFIX = "tag:"
+LOCK_PREFIX = "lock:"
+LOCK_TTL_MS = 5000
+LOCK_POLL_SECONDS = 0.05
+LOCK_WAIT_SECONDS = float(os.getenv("CACHE_LOCK_WAIT_SECONDS", 2))
+XFETCH_BETA = float(os.getenv("CACHE_XFETCH_BETA", 0))
+COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", 1024))
+INVALIDATION_RETRY_SECONDS = 1
+
+logger = logging.getLogger(__name__)
+clock = time.time
+
+@dataclass(frozen=True, slots=True)
+class CachePolicy:
+    soft_ttl: int
+    hard_ttl: int
+
+DEFAULT_POLICY = CachePolicy(soft_ttl=30, hard_ttl=30)
+POLICIES = {
+    "notes": CachePolicy(soft_ttl=30, hard_ttl=300),
+    "note": CachePolicy(soft_ttl=60, hard_ttl=600),
+}
+
+SET_TAGGED = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+for i = 2, #KEYS do
+    redis.call('SADD', KEYS[i], KEYS[1])
+    if redis.call('TTL', KEYS[i]) < tonumber(ARGV[2]) then
+        redis.call('EXPIRE', KEYS[i], ARGV[2])
+    end
+end
+"""
+
+INVALIDATE_TAGS = """
+local deleted = {}
+for i = 1, #KEYS do
+    for _, key in ipairs(redis.call('SMEMBERS', KEYS[i])) do
+        redis.call('DEL', key)
+        table.insert(deleted, key)
+    end
+    redis.call('DEL', KEYS[i])
+end
+if #deleted > 0 then
+    redis.call('PUBLISH', ARGV[1], cjson.encode(deleted))
+end
+return deleted
+"""
+
+RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_in_flight = {}
+_scripts = {}
+stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    qualities = {}
+    for part in accept_encoding.lower().split(","):
+        coding, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+class Entry:
+    __slots__ = ("body", "content_type", "encoding", "status_code", "delta", "fresh_until", "expires_at")
+
+    def __init__(self, body: bytes, content_type: str, encoding, status_code: int, delta: float, fresh_until: float, expires_at: float):
+        self.body = body
+        self.content_type = content_type
+        self.encoding = encoding
+        self.status_code = status_code
+        self.delta = delta
+        self.fresh_until = fresh_until
+        self.expires_at = expires_at
+
+    def encode(self) -> bytes:
+        header = {
+            "content_type": self.content_type,
+            "encoding": self.encoding,
+            "status_code": self.status_code,
+            "delta": self.delta,
+            "fresh_until": self.fresh_until,
+            "expires_at": self.expires_at,
+        }
+        return json.dumps(header).encode() + b"\n" + self.body
+
+    @classmethod
+    def decode(cls, raw: bytes):
+        header, _, body = raw.partition(b"\n")
+        meta = json.loads(header)
+        return cls(body, meta["content_type"], meta["encoding"], meta["status_code"], meta["delta"], meta["fresh_until"], meta["expires_at"])
+
+    def to_response(self, accept_encoding: str = "") -> Response:
+        body = self.body
+        headers = {}
+        if self.encoding == "gzip":
+            headers["Vary"] = "Accept-Encoding"
+            if accepts_gzip(accept_encoding):
+                headers["Content-Encoding"] = "gzip"
+            else:
+                body = gzip.decompress(body)
+        return Response(body, status_code=self.status_code, media_type=self.content_type, headers=headers)
+
+def cache_key(route: str, params: dict) -> str:
+    normalized = sorted((name, str(value)) for name, value in params.items() if value is not None)
+    return f"cache:{route}?{urlencode(normalized)}" if normalized else f"cache:{route}"
+
+def tag_key(tag: str) -> str:
+    return TAG_PREFIX + tag
+
+def script(source: str):
+    registered = _scripts.get(source)
+    if registered is None or registered.registered_client is not redis_client.redis:
+        registered = _scripts[source] = redis_client.redis.register_script(source)
+    return registered
+
+async def set_tagged(key: str, value: bytes, tags, ttl: int):
+    if redis_client.redis:
+        await script(SET_TAGGED)(keys=[key, *map(tag_key, tags)], args=[value, ttl])
+
+async def invalidate_tags(*tags):
+    if redis_client.redis:
+        deleted = [key.decode() for key in await script(INVALIDATE_TAGS)(keys=list(map(tag_key, tags)), args=[redis_client.INVALIDATION_CHANNEL])]
+        local_cache.invalidate(deleted)
+        return deleted
+    return []
+
+async def listen_for_invalidations():
+    while True:
+        pubsub = None
+        try:
+            pubsub = redis_client.redis.pubsub()
+            await pubsub.subscribe(redis_client.INVALIDATION_CHANNEL)
+            local_cache.clear()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    local_cache.invalidate(json.loads(message["data"]))
+        except Exception:
+            logger.warning("cache invalidation listener failed, resubscribing", exc_info=True)
+            local_cache.clear()
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(INVALIDATION_RETRY_SECONDS)
+
+async def read_l2(key: str):
+    raw = await redis_client.get_cached_bytes(key)
+    if raw is None:
+        return None
+    entry = Entry.decode(raw)
+    return entry if entry.expires_at > clock() else None
+
+async def read(key: str):
+    if not redis_client.redis:
+        return None
+    entry = local_cache.get(key, clock())
+    if entry is not None:
+        stats["l1_hits"] += 1
+        return entry
+    generation = local_cache.generation
+    entry = await read_l2(key)
+    if entry is None:
+        stats["misses"] += 1
+        return None
+    stats["l2_hits"] += 1
+    local_cache.put(key, entry, generation)
+    return entry
+
+def metrics():
+    lookups = stats["l1_hits"] + stats["l2_hits"] + stats["misses"]
+    l1_misses = stats["l2_hits"] + stats["misses"]
+    return {
+        **stats,
+        "l1_hit_ratio": stats["l1_hits"] / lookups if lookups else 0.0,
+        "l2_hit_ratio": stats["l2_hits"] / l1_misses if l1_misses else 0.0,
+        "l1": local_cache.metrics(),
+    }
+
+def is_fresh(entry: Entry, now: float) -> bool:
+    if now >= entry.fresh_until:
+        return False
+    return XFETCH_BETA <= 0 or now - entry.delta * XFETCH_BETA * math.log(1.0 - random.random()) < entry.fresh_until
+
+def _log_refresh_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("background cache refresh failed", exc_info=task.exception())
+
+def _start_flight(key: str, fn):
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(fn())
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    return task
+
+async def single_flight(key: str, fn):
+    return await asyncio.shield(_start_flight(key, fn))
+
+def refresh_in_background(key: str, fn):
+    if key not in _in_flight:
+        _start_flight(key, fn).add_done_callback(_log_refresh_failure)
+
+async def store(key: str, tags, load, policy: CachePolicy):
+    generation = local_cache.generation
+    start = time.perf_counter()
+    response = await load()
+    body, encoding = response.body, None
+    if len(body) >= COMPRESS_MIN_BYTES:
+        body, encoding = gzip.compress(body, compresslevel=5, mtime=0), "gzip"
+    now = clock()
+    entry = Entry(body, response.media_type, encoding, response.status_code, time.perf_counter() - start, now + policy.soft_ttl, now + policy.hard_ttl)
+    await set_tagged(key, entry.encode(), tags, policy.hard_ttl)
+    local_cache.put(key, entry, generation)
+    return entry
+
+async def recompute(key: str, tags, load, policy: CachePolicy, seen=None):
+    if not redis_client.redis:
+        return await store(key, tags, load, policy)
+    generation = local_cache.generation
+    if seen is not None:
+        # another worker may already have refreshed it; no need for the lock then
+        current = await read_l2(key)
+        if current is not None and current.fresh_until != seen.fresh_until:
+            local_cache.put(key, current, generation)
+            return current
+    lock = LOCK_PREFIX + key
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    while not await redis_client.redis.set(lock, token, nx=True, px=LOCK_TTL_MS):
+        if seen is not None:
+            return seen
+        if time.monotonic() >= deadline:
+            logger.warning("gave up waiting for the recompute lock on %s, loading directly", key)
+            return await store(key, tags, load, policy)
+        await asyncio.sleep(LOCK_POLL_SECONDS)
+        entry = await read_l2(key)
+        if entry is not None:
+            local_cache.put(key, entry, generation)
+            return entry
+    try:
+        current = await read_l2(key)
+        if current is not None and (seen is None or current.fresh_until != seen.fresh_until):
+            local_cache.put(key, current, generation)
+            return current
+        return await store(key, tags, load, policy)
+    finally:
+        await script(RELEASE_LOCK)(keys=[lock], args=[token])
+
+async def cached(key: str, tags, load, family: str = None):
+    policy = POLICIES.get(family, DEFAULT_POLICY)
+    entry = await read(key)
+    if entry is not None:
+        if not is_fresh(entry, clock()):
+            refresh_in_background(key, lambda: recompute(key, tags, load, policy, entry))
+        return entry
+    return await single_flight(key, lambda: recompute(key, tags, load, policy))
@@ -0,0 +1,56 @@
+from collections import OrderedDict
+import os
+
+L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", 16 * 1024 * 1024))
+ENTRY_OVERHEAD_BYTES = 200
+
+class LocalCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+
+    def get(self, key: str, now: float):
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        entry, size = item
+        if entry.expires_at <= now:
+            self.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry, generation: int = None):
+        if generation is not None and generation != self.generation:
+            return
+        size = len(key) + len(entry.body) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        self.pop(key)
+        self._entries[key] = (entry, size)
+        self.size_bytes += size
+        while self.size_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.size_bytes -= evicted_size
+
+    def pop(self, key: str):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.size_bytes -= item[1]
+
+    def invalidate(self, keys):
+        self.generation += 1
+        for key in keys:
+            self.pop(key)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def metrics(self):
+        return {"entries": len(self._entries), "size_bytes": self.size_bytes}
+
+local_cache = LocalCache(L1_MAX_BYTES)
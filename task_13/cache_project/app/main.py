@@ -1,21 +1,33 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from app.db import database, metadata, engine
 from app.models import notes
-from app.redis_client import init_redis, get_cached, set_cache, delete_cache
-from pydantic import BaseModel
-import json
+from app.redis_client import init_redis
+from app.cache import cache_key, cached, invalidate_tags, listen_for_invalidations, metrics
+from pydantic import BaseModel, TypeAdapter
+from typing import Optional
+import asyncio
+import os
+
+NOTES_PAGE_MAX_LIMIT = int(os.getenv("NOTES_PAGE_MAX_LIMIT", 100))
 
 app = FastAPI()
 
 metadata.create_all(engine)
 
+invalidation_listener = None
+
 @app.on_event("startup")
 async def startup():
+    global invalidation_listener
     await database.connect()
     await init_redis()
+    invalidation_listener = asyncio.create_task(listen_for_invalidations())
 
 @app.on_event("shutdown")
 async def shutdown():
+    if invalidation_listener is not None:
+        invalidation_listener.cancel()
     await database.disconnect()
 
 
@@ -26,26 +38,47 @@ class NoteIn(BaseModel):
 class NoteOut(NoteIn):
     id: int
 
+notes_adapter = TypeAdapter(list[NoteOut])
+note_adapter = TypeAdapter(NoteOut)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return metrics()
+
 
 @app.get("/notes", response_model=list[NoteOut])
-async def get_notes():
-    cache_key = "notes_all"
-    cached = await get_cached(cache_key)
-    if cached:
-        return json.loads(cached)
+async def get_notes(request: Request, limit: Optional[int] = Query(None, ge=1, le=NOTES_PAGE_MAX_LIMIT), offset: int = Query(0, ge=0)):
+    async def load():
+        query = notes.select().order_by(notes.c.id).offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        result = await database.fetch_all(query)
+        return Response(notes_adapter.dump_json(notes_adapter.validate_python([dict(r) for r in result])), media_type="application/json")
+
+    key = cache_key("/notes", {"limit": limit, "offset": offset})
+    entry = await cached(key, ["notes"], load, family="notes")
+    return entry.to_response(request.headers.get("accept-encoding", ""))
+
+
+@app.get("/notes/{note_id}", response_model=NoteOut)
+async def get_note(request: Request, note_id: int):
+    async def load():
+        result = await database.fetch_one(notes.select().where(notes.c.id == note_id))
+        if result is None:
+            return JSONResponse({"detail": "Note not found"}, status_code=404)
+        return Response(note_adapter.dump_json(note_adapter.validate_python(dict(result))), media_type="application/json")
 
-    query = notes.select()
-    result = await database.fetch_all(query)
-    result_list = [dict(r) for r in result]
-    await set_cache(cache_key, json.dumps(result_list))
-    return result_list
+    key = cache_key("/notes/{note_id}", {"note_id": note_id})
+    entry = await cached(key, [f"note:{note_id}"], load, family="note")
+    return entry.to_response(request.headers.get("accept-encoding", ""))
 
 
 @app.post("/notes", response_model=NoteOut)
 async def create_note(note: NoteIn):
     query = notes.insert().values(title=note.title, content=note.content)
     note_id = await database.execute(query)
-    await delete_cache("notes_all")
+    await invalidate_tags("notes", f"note:{note_id}")
     return {**note.dict(), "id": note_id}
 
 
@@ -55,5 +88,5 @@ async def delete_note(note_id: int):
     result = await database.execute(query)
     if result == 0:
         raise HTTPException(status_code=404, detail="Note not found")
-    await delete_cache("notes_all")
+    await invalidate_tags("notes", f"note:{note_id}")
     return {"message": "Note deleted"}
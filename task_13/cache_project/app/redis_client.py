@@ -1,4 +1,7 @@
-import aioredis
+import redis.asyncio as aioredis
+import json
+
+INVALIDATION_CHANNEL = "cache:invalidate"
 
 redis = None
 
@@ -13,10 +16,18 @@ async def get_cached(key: str):
             return value.decode("utf-8")
     return None
 
+async def get_cached_bytes(key: str):
+    if redis:
+        return await redis.get(key)
+    return None
+
 async def set_cache(key: str, value: str, ttl: int = 30):
     if redis:
         await redis.set(key, value, ex=ttl)
 
 async def delete_cache(key: str):
     if redis:
-        await redis.delete(key)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.publish(INVALIDATION_CHANNEL, json.dumps([key]))
+            await pipe.execute()
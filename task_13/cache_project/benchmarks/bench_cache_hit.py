@@ -0,0 +1,64 @@
+import asyncio
+import json
+import os
+import time
+
+import httpx
+import redis.asyncio as aioredis
+from app import redis_client
+from app.db import database, engine
+from app.local_cache import local_cache
+from app.main import app, NoteOut
+from app.models import notes
+
+NOTES = 5000
+ROUNDS = int(os.getenv("BENCH_ROUNDS", 200))
+LEGACY_KEY = "bench:legacy_notes"
+
+@app.get("/bench/legacy-notes", response_model=list[NoteOut])
+async def legacy_get_notes():
+    cached = await redis_client.get_cached(LEGACY_KEY)
+    if cached:
+        return json.loads(cached)
+    result_list = [dict(r) for r in await database.fetch_all(notes.select())]
+    await redis_client.set_cache(LEGACY_KEY, json.dumps(result_list), ttl=300)
+    return result_list
+
+def connect_redis():
+    url = os.getenv("REDIS_URL")
+    if url:
+        return aioredis.from_url(url)
+    import fakeredis
+    return fakeredis.FakeAsyncRedis()
+
+async def timed(client, path, headers=None):
+    (await client.get(path, headers=headers)).raise_for_status()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        (await client.get(path, headers=headers)).raise_for_status()
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+async def main():
+    with engine.begin() as conn:
+        conn.execute(notes.delete())
+        conn.execute(notes.insert(), [{"title": f"title {i}", "content": "content " * 20} for i in range(NOTES)])
+    await database.connect()
+    redis_client.redis = connect_redis()
+    await redis_client.redis.flushdb()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        legacy_ms = await timed(client, "/bench/legacy-notes")
+        max_bytes, local_cache.max_bytes = local_cache.max_bytes, 0
+        l2_ms = await timed(client, "/notes", {"Accept-Encoding": "identity"})
+        l2_gzip_ms = await timed(client, "/notes", {"Accept-Encoding": "gzip"})
+        local_cache.max_bytes = max_bytes
+        l1_ms = await timed(client, "/notes", {"Accept-Encoding": "gzip"})
+    await database.disconnect()
+    print(f"{NOTES} notes, cache hit latency")
+    print(f"  before (json.loads + response_model): {legacy_ms:7.2f} ms")
+    print(f"  raw bytes from Redis, identity:        {l2_ms:7.2f} ms")
+    print(f"  raw bytes from Redis, gzip:            {l2_gzip_ms:7.2f} ms")
+    print(f"  raw bytes from L1, gzip:               {l1_ms:7.2f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
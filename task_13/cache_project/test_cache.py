@@ -0,0 +1,292 @@
+import asyncio
+import gzip
+import pytest
+from fastapi import Response
+from fastapi.testclient import TestClient
+from app import cache, redis_client
+from app.main import app
+from app.local_cache import ENTRY_OVERHEAD_BYTES, LocalCache, local_cache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache, "clock", fake)
+    monkeypatch.setattr(cache, "POLICIES", {"notes": cache.CachePolicy(soft_ttl=10, hard_ttl=60), "note": cache.CachePolicy(soft_ttl=1, hard_ttl=5)})
+    monkeypatch.setattr(redis_client, "redis", fakeredis.FakeAsyncRedis())
+    local_cache.clear()
+    return fake
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return Response(f"v{self.calls}".encode(), media_type="text/plain")
+
+async def cached_body(*args, **kwargs):
+    return (await cache.cached(*args, **kwargs)).body
+
+def test_fresh_entries_are_served_without_loading(clock):
+    load = Loader()
+
+    async def scenario():
+        assert await cached_body("k", ["notes"], load, family="notes") == b"v1"
+        clock.now += 9
+        assert await cached_body("k", ["notes"], load, family="notes") == b"v1"
+
+    asyncio.run(scenario())
+    assert load.calls == 1
+
+def test_stale_entry_is_served_while_one_background_refresh_runs(clock):
+    load = Loader()
+
+    async def scenario():
+        await cached_body("k", ["notes"], load, family="notes")
+        clock.now += 30
+        stale = await asyncio.gather(*[cached_body("k", ["notes"], load, family="notes") for _ in range(10)])
+        assert stale == [b"v1"] * 10
+        await asyncio.sleep(0.05)
+        assert await cached_body("k", ["notes"], load, family="notes") == b"v2"
+
+    asyncio.run(scenario())
+    assert load.calls == 2
+
+def test_callers_block_past_the_hard_ttl(clock):
+    load = Loader()
+
+    async def scenario():
+        await cached_body("k", ["notes"], load, family="notes")
+        clock.now += 61
+        assert await cached_body("k", ["notes"], load, family="notes") == b"v2"
+
+    asyncio.run(scenario())
+    assert load.calls == 2
+
+def test_policies_are_per_key_family(clock):
+    notes, note = Loader(), Loader()
+
+    async def scenario():
+        await cached_body("list", ["notes"], notes, family="notes")
+        await cached_body("one", ["note:1"], note, family="note")
+        clock.now += 6
+        assert await cached_body("list", ["notes"], notes, family="notes") == b"v1"
+        assert await cached_body("one", ["note:1"], note, family="note") == b"v2"
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert (notes.calls, note.calls) == (1, 2)
+
+def test_large_bodies_are_stored_compressed_and_served_raw(clock):
+    payload = b"[" + b",".join(b'{"id": %d}' % i for i in range(500)) + b"]"
+
+    async def load():
+        return Response(payload, media_type="application/json")
+
+    async def scenario():
+        await cache.cached("big", ["notes"], load, family="notes")
+        cache.local_cache.clear()
+        return await cache.cached("big", ["notes"], load, family="notes")
+
+    entry = asyncio.run(scenario())
+    assert entry.encoding == "gzip"
+    assert gzip.decompress(entry.body) == payload
+
+    compressed = entry.to_response("gzip, deflate")
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["content-type"] == "application/json"
+    assert compressed.body == entry.body
+    assert entry.to_response("").body == payload
+
+def test_one_recompute_across_concurrent_callers_and_workers(clock):
+    load = Loader()
+
+    async def scenario():
+        # cached() coalesces in-process; calling recompute() directly stands in for other workers
+        in_process = [cached_body("k", ["notes"], load, family="notes") for _ in range(5)]
+        other_workers = [cache.recompute("k", ["notes"], load, cache.POLICIES["notes"]) for _ in range(5)]
+        results = await asyncio.gather(*in_process, *other_workers)
+        return [result if isinstance(result, bytes) else result.body for result in results]
+
+    assert asyncio.run(scenario()) == [b"v1"] * 10
+    assert load.calls == 1
+
+def test_lock_wait_is_bounded(clock, monkeypatch):
+    monkeypatch.setattr(cache, "LOCK_WAIT_SECONDS", 0.1)
+    load = Loader()
+
+    async def scenario():
+        await redis_client.redis.set(cache.LOCK_PREFIX + "k", "other-worker", px=cache.LOCK_TTL_MS)
+        return await asyncio.wait_for(cached_body("k", ["notes"], load, family="notes"), timeout=1)
+
+    assert asyncio.run(scenario()) == b"v1"
+    assert load.calls == 1
+
+def make_entry(body: bytes, expires_at: float = float("inf")):
+    return cache.Entry(body, "text/plain", None, 200, 0.0, expires_at, expires_at)
+
+def test_l1_evicts_least_recently_used_by_bytes():
+    l1 = LocalCache(max_bytes=2 * (1 + 100 + ENTRY_OVERHEAD_BYTES))
+    l1.put("a", make_entry(b"x" * 100))
+    l1.put("b", make_entry(b"x" * 100))
+    assert l1.get("a", 0) is not None
+    l1.put("c", make_entry(b"x" * 100))
+
+    assert l1.get("b", 0) is None
+    assert l1.get("a", 0) is not None and l1.get("c", 0) is not None
+    assert l1.size_bytes == 2 * (1 + 100 + ENTRY_OVERHEAD_BYTES)
+
+    l1.put("huge", make_entry(b"x" * l1.max_bytes))
+    assert l1.get("huge", 0) is None
+    assert l1.get("a", 0) is not None
+
+def test_l1_skips_puts_that_raced_an_invalidation():
+    l1 = LocalCache(max_bytes=1024)
+    generation = l1.generation
+    l1.invalidate(["k"])
+    l1.put("k", make_entry(b"stale"), generation)
+    assert l1.get("k", 0) is None
+
+    l1.put("k", make_entry(b"fresh"), l1.generation)
+    assert l1.get("k", 0).body == b"fresh"
+
+async def wait_until(condition, timeout: float = 1.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met")
+
+def test_pubsub_invalidation_evicts_l1_on_other_workers(clock):
+    async def scenario():
+        generation = local_cache.generation
+        listener = asyncio.create_task(cache.listen_for_invalidations())
+        try:
+            # the listener clears L1 once it is subscribed
+            await wait_until(lambda: local_cache.generation > generation)
+            local_cache.put("cache:/notes", make_entry(b"cached"))
+            local_cache.put("cache:/other", make_entry(b"cached"))
+            # another worker invalidated the key; only the pub/sub message reaches us
+            await redis_client.redis.publish(redis_client.INVALIDATION_CHANNEL, '["cache:/notes"]')
+            await wait_until(lambda: local_cache.get("cache:/notes", clock()) is None)
+            assert local_cache.get("cache:/other", clock()) is not None
+        finally:
+            listener.cancel()
+
+    asyncio.run(scenario())
+
+class FlakyPubSubRedis:
+    def __init__(self, redis):
+        self.redis = redis
+        self.subscriptions = 0
+
+    def pubsub(self):
+        self.subscriptions += 1
+        if self.subscriptions == 1:
+            raise RuntimeError("connection reset")
+        return self.redis.pubsub()
+
+def test_listener_logs_clears_l1_and_resubscribes(clock, monkeypatch, caplog):
+    flaky = FlakyPubSubRedis(redis_client.redis)
+    monkeypatch.setattr(redis_client, "redis", flaky)
+    monkeypatch.setattr(cache, "INVALIDATION_RETRY_SECONDS", 0)
+    local_cache.put("cache:/notes", make_entry(b"cached"))
+
+    async def scenario():
+        listener = asyncio.create_task(cache.listen_for_invalidations())
+        try:
+            await wait_until(lambda: flaky.subscriptions == 2)
+        finally:
+            listener.cancel()
+
+    asyncio.run(scenario())
+    assert local_cache.get("cache:/notes", clock()) is None
+    assert any("resubscribing" in record.message for record in caplog.records)
+
+def test_tag_invalidation_removes_every_route_derived_key(clock):
+    load = Loader()
+    pages = [cache.cache_key("/notes", {"limit": limit, "offset": offset}) for limit in (10, 20) for offset in (0, 10)]
+    note = cache.cache_key("/notes/{note_id}", {"note_id": 1})
+    other = cache.cache_key("/notes/{note_id}", {"note_id": 2})
+
+    async def scenario():
+        for key in pages:
+            await cache.cached(key, ["notes"], load, family="notes")
+        await cache.cached(note, ["note:1"], load, family="note")
+        await cache.cached(other, ["note:2"], load, family="note")
+
+        deleted = await cache.invalidate_tags("notes", "note:1")
+        remaining = [key for key in [*pages, note, other] if await redis_client.redis.exists(key)]
+        return deleted, remaining
+
+    deleted, remaining = asyncio.run(scenario())
+    assert sorted(deleted) == sorted([*pages, note])
+    assert remaining == [other]
+    assert all(local_cache.get(key, clock()) is None for key in [*pages, note])
+    assert local_cache.get(other, clock()) is not None
+
+def test_scripts_are_registered_once_per_client(clock, monkeypatch):
+    registrations = []
+    register_script = redis_client.redis.register_script
+    monkeypatch.setattr(redis_client.redis, "register_script", lambda source: registrations.append(source) or register_script(source))
+
+    async def scenario():
+        for offset in range(3):
+            await cache.cached(cache.cache_key("/notes", {"offset": offset}), ["notes"], Loader(), family="notes")
+        await cache.invalidate_tags("notes")
+
+    asyncio.run(scenario())
+    assert sorted(registrations) == sorted([cache.SET_TAGGED, cache.RELEASE_LOCK, cache.INVALIDATE_TAGS])
+
+def test_accept_encoding_q_values():
+    assert cache.accepts_gzip("gzip, deflate")
+    assert cache.accepts_gzip("deflate;q=0.5, GZIP;q=0.8")
+    assert cache.accepts_gzip("*")
+    assert not cache.accepts_gzip("")
+    assert not cache.accepts_gzip("gzip;q=0")
+    assert not cache.accepts_gzip("gzip;q=0.000, br")
+    assert not cache.accepts_gzip("*, gzip;q=0")
+    assert not cache.accepts_gzip("deflate")
+
+    entry = cache.Entry(gzip.compress(b"payload"), "text/plain", "gzip", 200, 0.0, 0.0, 0.0)
+    response = entry.to_response("gzip;q=0, identity")
+    assert "content-encoding" not in response.headers
+    assert response.body == b"payload"
+
+def test_refresh_adopts_entry_another_worker_stored(clock, monkeypatch):
+    worker_a, worker_b = LocalCache(1024 * 1024), LocalCache(1024 * 1024)
+    load_a, load_b = Loader(), Loader()
+    load_b.calls = 1
+
+    async def scenario():
+        monkeypatch.setattr(cache, "local_cache", worker_a)
+        assert await cached_body("k", ["notes"], load_a, family="notes") == b"v1"
+
+        clock.now += 11
+        monkeypatch.setattr(cache, "local_cache", worker_b)
+        await cache.store("k", ["notes"], load_b, cache.POLICIES["notes"])
+
+        monkeypatch.setattr(cache, "local_cache", worker_a)
+        assert await cached_body("k", ["notes"], load_a, family="notes") == b"v1"
+        await asyncio.sleep(0.05)
+        clock.now += 1
+        assert await cached_body("k", ["notes"], load_a, family="notes") == b"v2"
+        assert worker_a.get("k", clock()).body == b"v2"
+
+    asyncio.run(scenario())
+    assert (load_a.calls, load_b.calls) == (1, 2)
+
+def test_notes_page_params_are_validated():
+    client = TestClient(app)
+    for params in ({"limit": 0}, {"limit": 101}, {"offset": -1}, {"limit": -5}):
+        assert client.get("/notes", params=params).status_code == 422
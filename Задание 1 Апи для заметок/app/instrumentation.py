@@ -0,0 +1,88 @@
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+import logging
+import os
+import re
+import time
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 10))
+
+logger = logging.getLogger("sql")
+
+_request_stats = ContextVar("request_stats", default=None)
+_literals = re.compile(r"\b\d+\b|'[^']*'")
+_whitespace = re.compile(r"\s+")
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_seconds", "statements")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = Counter()
+
+    @property
+    def route(self):
+        route = self.scope.get("route")
+        return getattr(route, "path", self.scope.get("path"))
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries"'
+
+def statement_shape(statement: str) -> str:
+    return _whitespace.sub(" ", _literals.sub("?", statement)).strip()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        stats.statements[statement_shape(statement)] += 1
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        route = stats.route if stats is not None else None
+        logger.warning("slow query (%.1f ms) on %s: %s", elapsed * 1000, route, statement)
+
+def _handle_error(exception_context):
+    if exception_context.connection is not None and exception_context.connection.info.get("query_start"):
+        exception_context.connection.info["query_start"].pop()
+
+def instrument_engine(engine):
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def report_n_plus_one(stats: RequestStats):
+    for shape, count in stats.statements.items():
+        if count > N_PLUS_ONE_THRESHOLD:
+            logger.warning("possible N+1 on %s: %d near-identical statements: %s", stats.route, count, shape)
+
+class SQLTimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats(scope)
+        token = _request_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            report_n_plus_one(stats)
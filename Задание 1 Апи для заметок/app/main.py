@@ -1,5 +1,6 @@
 from fastapi import FastAPI, Depends
 from app.database import async_session, init_db
+from app.instrumentation import SQLTimingMiddleware
 from app.models import Note
 from app.schemas import NoteCreate, NoteOut
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -7,6 +8,7 @@ from sqlalchemy.future import select
 from typing import List
 
 app = FastAPI()
+app.add_middleware(SQLTimingMiddleware)
 
 @app.on_event("startup")
 async def on_startup():